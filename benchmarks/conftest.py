@@ -0,0 +1,41 @@
+import pytest
+
+from posts import benchmarks
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption(
+        '--benchmark-size', choices=benchmarks.SIZES, default='small'
+    )
+    group.addoption(
+        '--benchmark-repeat', type=int, default=benchmarks.REPEAT
+    )
+    group.addoption(
+        '--benchmark-threshold', type=float, default=benchmarks.THRESHOLD,
+        help='Допустимое замедление, доля от базовой линии.'
+    )
+    group.addoption(
+        '--benchmark-save', help='Сохранить результаты в JSON-файл.'
+    )
+
+
+@pytest.fixture(scope='session')
+def report(request, django_db_setup, django_db_blocker):
+    options = request.config.option
+    with django_db_blocker.unblock():
+        report = benchmarks.run(
+            options.benchmark_size, options.benchmark_repeat
+        )
+    if options.benchmark_save:
+        benchmarks.save(report, options.benchmark_save)
+    return report
+
+
+@pytest.fixture(scope='session')
+def baseline(request):
+    path = benchmarks.baseline_path(request.config.option.benchmark_size)
+    try:
+        return benchmarks.load(path)
+    except FileNotFoundError:
+        pytest.skip(f'Нет базовой линии {path}')
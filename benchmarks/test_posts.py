@@ -0,0 +1,17 @@
+import pytest
+
+from posts import benchmarks
+
+# Набор данных засевается один раз на сессию в фикстуре report.
+pytestmark = pytest.mark.django_db
+
+
+def test_no_regressions(report, baseline, request):
+    regressions = benchmarks.compare(
+        report, baseline, request.config.option.benchmark_threshold
+    )
+    assert not regressions, '\n'.join(regressions)
+
+
+def test_baseline_covers_all_cases(report, baseline):
+    assert set(report['results']) == set(baseline['results'])
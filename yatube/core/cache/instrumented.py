@@ -0,0 +1,38 @@
+"""Бэкенды кэша, которые считают попадания и промахи текущего запроса.
+
+Счётчики попадают в core.perf и видны в заголовке Server-Timing и на
+странице статистики. Вне запроса обёртки ничего не делают.
+"""
+from django.core.cache.backends import locmem
+
+from core import perf
+
+from . import sqlite
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    def get(self, key, default=None, version=None):
+        # BaseCache.get_many() вызывает get(): такие чтения уже
+        # посчитаны в get_many().
+        with perf.cache_suspended():
+            value = super().get(key, _MISSING, version)
+        hit = value is not _MISSING
+        perf.record_cache(hits=int(hit), misses=int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with perf.cache_suspended():
+            found = super().get_many(keys, version)
+        perf.record_cache(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class SQLiteCache(InstrumentedCacheMixin, sqlite.SQLiteCache):
+    pass
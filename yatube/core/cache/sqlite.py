@@ -0,0 +1,250 @@
+"""Кэш в SQLite-файле, общий для всех процессов на одной машине.
+
+Файл открывается в режиме WAL, поэтому читатели не ждут писателей.
+Целые числа хранятся как есть, и incr() выполняется одним UPDATE, а
+смена версии ключа — одним переименованием в транзакции. При превышении
+MAX_ENTRIES вытесняются давно не читавшиеся записи (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Время последнего чтения обновляется не чаще раза в секунду на ключ.
+ACCESS_RESOLUTION = 1
+# Как часто (в записях на процесс) проверять размер кэша.
+CULL_CHECK_EVERY = 100
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_VARIABLES = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого форка.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _select(self, keys):
+        now = time.time()
+        found = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows = self._connection.execute(
+                'SELECT key, value, accessed FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                chunk + [now],
+            ).fetchall()
+            found.update((key, (value, accessed))
+                         for key, value, accessed in rows)
+        stale = [
+            key for key, (value, accessed) in found.items()
+            if accessed < now - ACCESS_RESOLUTION
+        ]
+        if stale:
+            self._connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, key) for key in stale],
+            )
+        return {key: self._load(value) for key, (value, _) in found.items()}
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._select([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {
+            keys[key]: value
+            for key, value in self._select(list(keys)).items()
+        }
+
+    def _write(self, rows):
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+        self._writes += len(rows)
+        if self._writes >= CULL_CHECK_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        self._write([(key, self._dump(value), expires, time.time())])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        self._write([
+            (self._key(key, version), self._dump(value), expires, now)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now)
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._dump(value), expires, now),
+            )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, key, time.time()),
+            )
+            if cursor.rowcount != 1:
+                raise ValueError("Key '%s' not found" % key)
+            (value,), = connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchall()
+        return value
+
+    def incr_version(self, key, delta=1, version=None):
+        if version is None:
+            version = self.version
+        old = self._key(key, version)
+        new = self._key(key, version + delta)
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache WHERE key = ?', (new,))
+            cursor = connection.execute(
+                'UPDATE cache SET key = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (new, old, time.time()),
+            )
+        if cursor.rowcount != 1:
+            raise ValueError("Key '%s' not found" % key)
+        return version + delta
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._select([key])
+
+    def delete(self, key, version=None):
+        self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                [(self._key(key, version),) for key in keys],
+            )
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def _cull(self):
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
+            (count,), = connection.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchall()
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+                return
+            # Как и в остальных бэкендах Django, удаляем 1/CULL_FREQUENCY
+            # записей, но не случайных, а давно не читавшихся.
+            excess = count - self._max_entries
+            evict = max(excess, count // self._cull_frequency)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (evict,),
+            )
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: запись сразу берёт блокировку файла."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,64 @@
+"""Шапка и подвал, общие для всех страниц, закэшированные в процессе.
+
+Шапка зависит только от того, вошёл ли пользователь, и от текущего
+представления, поэтому для каждой пары она рендерится один раз, а имя
+пользователя подставляется в готовый фрагмент. Кэш включается вместе
+с TEMPLATE_CACHE: при разработке правки шаблонов видны сразу.
+"""
+import functools
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+HEADER = 'includes/header.html'
+FOOTER = 'includes/footer.html'
+# Метка на месте имени пользователя в закэшированной шапке.
+USERNAME = '__chrome_username__'
+
+_fragments = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _reverse(name, prefix, urlconf):
+    return reverse(name, urlconf)
+
+
+def nav_url(name):
+    """reverse() для адресов навигации без аргументов с мемоизацией."""
+    return _reverse(name, get_script_prefix(), get_urlconf())
+
+
+def fragment(template_name, **context):
+    """Рендерит шаблон, а с TEMPLATE_CACHE — один раз на context."""
+    if not settings.TEMPLATE_CACHE:
+        return get_template(template_name).render(context)
+    key = (template_name, get_script_prefix(), *sorted(context.items()))
+    html = _fragments.get(key)
+    if html is None:
+        html = _fragments[key] = get_template(template_name).render(context)
+    return html
+
+
+def header(request, user):
+    match = getattr(request, 'resolver_match', None)
+    html = fragment(
+        HEADER,
+        is_authenticated=user.is_authenticated,
+        view_name=match.view_name if match else None,
+        username=USERNAME,
+    )
+    return mark_safe(
+        html.replace(USERNAME, conditional_escape(user.get_username()))
+    )
+
+
+def footer(year):
+    return mark_safe(fragment(FOOTER, year=year))
+
+
+def reset():
+    _fragments.clear()
+    _reverse.cache_clear()
@@ -0,0 +1,20 @@
+"""Бэкенд SQLite, который открывает транзакции с BEGIN IMMEDIATE.
+
+Обычный BEGIN откладывает блокировку до первой записи. Если к этому
+моменту пишет другой процесс, SQLite сразу отвечает "database is
+locked", не дожидаясь busy_timeout. BEGIN IMMEDIATE берёт блокировку
+записи в начале транзакции и ждёт её штатно.
+"""
+from django.db.backends.sqlite3 import base
+
+
+def is_read_only(settings_dict):
+    return 'mode=ro' in settings_dict['NAME']
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        if is_read_only(self.settings_dict):
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute('BEGIN IMMEDIATE')
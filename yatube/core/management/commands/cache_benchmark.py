@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+BATCH = 50
+
+
+def _backends(directory):
+    params = {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': 100000}}
+    return {
+        'locmem': LocMemCache('benchmark', params),
+        'filebased': FileBasedCache(
+            os.path.join(directory, 'filebased'), params
+        ),
+        'sqlite': SQLiteCache(
+            os.path.join(directory, 'shared.sqlite3'), params
+        ),
+    }
+
+
+def _operations(cache, keys, value):
+    batches = [keys[i:i + BATCH] for i in range(0, len(keys), BATCH)]
+    return {
+        'set': lambda: [cache.set(key, value) for key in keys],
+        'get': lambda: [cache.get(key) for key in keys],
+        'get_many': lambda: [cache.get_many(batch) for batch in batches],
+        'set_many': lambda: [
+            cache.set_many(dict.fromkeys(batch, value)) for batch in batches
+        ],
+        'incr': lambda: [cache.incr('counter') for key in keys],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость LocMemCache, FileBasedCache и SQLiteCache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--size', type=int, default=1024)
+
+    def handle(self, *args, **options):
+        keys = [f'key:{i}' for i in range(options['keys'])]
+        value = 'x' * options['size']
+        columns = ['set', 'get', 'get_many', 'set_many', 'incr']
+        self.stdout.write(
+            'Операций в секунду (get_many/set_many — '
+            f'пачками по {BATCH} ключей)'
+        )
+        self.stdout.write(
+            f'{"backend":<10}' + ''.join(f'{name:>12}' for name in columns)
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, cache in _backends(directory).items():
+                cache.set('counter', 0)
+                operations = _operations(cache, keys, value)
+                rates = []
+                for column in columns:
+                    started = time.perf_counter()
+                    operations[column]()
+                    elapsed = time.perf_counter() - started
+                    rates.append(len(keys) / elapsed if elapsed else 0)
+                self.stdout.write(
+                    f'{name:<10}' + ''.join(f'{rate:>12.0f}' for rate in rates)
+                )
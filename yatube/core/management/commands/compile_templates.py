@@ -0,0 +1,24 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.template_backends import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Компилирует все шаблоны и падает на первом битом: проверка '
+        'перед выкладкой.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            count = warm_up()
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f'Шаблонов скомпилировано: {count} ({elapsed:.0f} мс)'
+        )
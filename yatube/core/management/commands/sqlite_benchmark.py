@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_author ON post (author_id)',
+    'CREATE TABLE counters (id INTEGER PRIMARY KEY, posts INTEGER)',
+)
+AUTHORS = 100
+# Как соединяется Django по умолчанию: таймаут модуля sqlite3.
+TIMEOUT = 5
+
+
+def _connect(path, tuned):
+    connection = sqlite3.connect(path, timeout=TIMEOUT, isolation_level=None)
+    connection.execute('PRAGMA foreign_keys = ON')
+    if tuned:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def _read(connection, author_id):
+    connection.execute(
+        'SELECT id, text FROM post ORDER BY pub_date DESC LIMIT 10'
+    ).fetchall()
+    connection.execute(
+        'SELECT count(*) FROM post WHERE author_id = ?', [author_id]
+    ).fetchone()
+
+
+def _write(connection, author_id, tuned):
+    # Как post_create: чтение и запись в одной транзакции.
+    connection.execute('BEGIN IMMEDIATE' if tuned else 'BEGIN')
+    try:
+        _read(connection, author_id)
+        connection.execute(
+            'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+            [author_id, 'Текст поста ' * 20, time.time()],
+        )
+        connection.execute(
+            'UPDATE counters SET posts = posts + 1 WHERE id = ?', [author_id]
+        )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+
+
+def _worker(path, tuned, duration, write_ratio, seed, results):
+    """Запросы одного процесса gunicorn: (всего, записей, блокировок)."""
+    rng = random.Random(seed)
+    done = writes = locked = 0
+    connection = _connect(path, tuned) if tuned else None
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if not tuned:
+            # Без CONN_MAX_AGE каждый запрос открывает новое соединение.
+            connection = _connect(path, tuned)
+        author_id = rng.randrange(AUTHORS)
+        try:
+            if rng.random() < write_ratio:
+                _write(connection, author_id, tuned)
+                writes += 1
+            else:
+                _read(connection, author_id)
+            done += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+        finally:
+            if not tuned:
+                connection.close()
+    results.put((done, writes, locked))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при параллельных '
+        'процессах: настройки Django по умолчанию и SQLITE_PRAGMAS с '
+        'постоянными соединениями и BEGIN IMMEDIATE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на каждый режим.'
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля пишущих запросов.'
+        )
+
+    def run(self, tuned, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            connection = _connect(path, tuned)
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.executemany(
+                'INSERT INTO counters VALUES (?, 0)',
+                [[pk] for pk in range(AUTHORS)],
+            )
+            connection.close()
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(target=_worker, args=(
+                    path, tuned, options['duration'],
+                    options['write_ratio'], seed, results,
+                ))
+                for seed in range(options['workers'])
+            ]
+            for worker in workers:
+                worker.start()
+            done, writes, locked = (sum(column) for column in zip(*(
+                results.get() for _ in workers
+            )))
+            for worker in workers:
+                worker.join()
+        duration = options['duration']
+        return done / duration, writes / duration, locked
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"режим":<10}{"запросов/с":>12}{"записей/с":>12}'
+            f'{"locked":>10}'
+        )
+        baseline = None
+        for name, tuned in (('default', False), ('tuned', True)):
+            requests, writes, locked = self.run(tuned, options)
+            self.stdout.write(
+                f'{name:<10}{requests:>12.0f}{writes:>12.0f}{locked:>10}'
+            )
+            baseline = baseline or requests
+        self.stdout.write(f'Прирост: x{requests / baseline:.2f}')
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.replicas import sync_sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик: локальная замена '
+        'репликации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Какие реплики обновить (по умолчанию DATABASE_REPLICAS).'
+        )
+        parser.add_argument(
+            '--every', type=float,
+            help='Повторять каждые N секунд, имитируя отставание реплики.'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        while True:
+            for alias in aliases:
+                sync_sqlite(alias)
+                self.stdout.write(f'{alias}: обновлена')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,99 @@
+"""Измерение стоимости каждого запроса и бюджеты SQL-запросов."""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import perf, replicas
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def server_timing(elapsed, stats):
+    return ', '.join((
+        f'total;dur={elapsed * 1000:.1f}',
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+        f'cache;desc="{stats.cache_hits} hits, '
+        f'{stats.cache_misses} misses"',
+    ))
+
+
+def check_budget(name, queries):
+    """Сравнивает число запросов с бюджетом представления из QUERY_BUDGETS.
+
+    Превышение пишется в лог, а при QUERY_BUDGET_STRICT (в тестах)
+    ещё и роняет запрос.
+    """
+    budget = settings.QUERY_BUDGETS.get(name)
+    if budget is None or queries <= budget:
+        return
+    message = f'{name}: {queries} SQL-запросов при бюджете {budget}'
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def show_server_timing(request):
+    """Server-Timing всем при PERF_SERVER_TIMING, иначе только staff."""
+    if settings.PERF_SERVER_TIMING:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class PerformanceMiddleware:
+    """Время ответа, SQL, рендер шаблонов и кэш по именам представлений.
+
+    Для потоковых ответов учитывается время до первого байта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with perf.collect() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(perf.execute))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        name = view_name(request)
+        if show_server_timing(request):
+            response['Server-Timing'] = server_timing(elapsed, stats)
+        perf.record(name, elapsed, stats)
+        check_budget(name, stats.queries)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """После записи закрепляет клиента за основной базой.
+
+    Метка хранится в cookie, поэтому её видят все процессы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = replicas.PIN_COOKIE in request.COOKIES
+        with replicas.request_state(pinned) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                replicas.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,231 @@
+"""Стоимость запросов: время, SQL, шаблоны и кэш по именам представлений.
+
+PerformanceMiddleware собирает показатели текущего запроса в RequestStats.
+Каждый процесс копит гистограммы у себя и раз в PERF_FLUSH_INTERVAL
+секунд сохраняет снимок в общий кэш; perf_snapshot() складывает снимки
+всех процессов.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Верхние границы корзин гистограммы времени ответа, мс. Последняя
+# корзина гистограммы — всё, что дольше BUCKETS[-1].
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+SNAPSHOT_KEY = 'perf:snapshot:{}'
+PROCESSES_KEY = 'perf:processes'
+# Снимок процесса, который давно не обновлялся, считается устаревшим.
+PROCESS_TTL = 24 * 60 * 60
+
+_current = ContextVar('perf_request_stats', default=None)
+_lock = threading.Lock()
+_views = {}
+_last_flush = time.monotonic()
+
+
+class RequestStats:
+    """Показатели одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._template_depth = 0
+        self._cache_suspended = 0
+
+
+def current():
+    return _current.get()
+
+
+def execute(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper()."""
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+@contextmanager
+def collect():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def detached():
+    """Не относить работу внутри блока к текущему запросу.
+
+    Для того, что в бою выполняется в фоне, а в тестах — синхронно.
+    """
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def template_timer():
+    """Время рендера шаблона; вложенные рендеры не считаются дважды."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats._template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats._template_depth -= 1
+        if not stats._template_depth:
+            stats.template_time += time.perf_counter() - started
+
+
+def record_cache(hits=0, misses=0):
+    stats = current()
+    if stats is not None and not stats._cache_suspended:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+@contextmanager
+def cache_suspended():
+    """Не считать обращения к кэшу внутри блока (get_many через get)."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats._cache_suspended += 1
+    try:
+        yield
+    finally:
+        stats._cache_suspended -= 1
+
+
+def _empty():
+    return {
+        'requests': 0, 'time': 0.0, 'queries': 0, 'max_queries': 0,
+        'db_time': 0.0, 'template_time': 0.0, 'cache_hits': 0,
+        'cache_misses': 0, 'buckets': [0] * (len(BUCKETS) + 1),
+    }
+
+
+def _merge(total, view):
+    for key, value in view.items():
+        if key == 'buckets':
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        elif key == 'max_queries':
+            total[key] = max(total[key], value)
+        else:
+            total[key] += value
+
+
+def record(view_name, elapsed, stats):
+    """Добавляет запрос в гистограммы процесса."""
+    bucket = bisect.bisect_left(BUCKETS, elapsed * 1000)
+    with _lock:
+        view = _views.setdefault(view_name, _empty())
+        view['requests'] += 1
+        view['time'] += elapsed
+        view['queries'] += stats.queries
+        view['max_queries'] = max(view['max_queries'], stats.queries)
+        view['db_time'] += stats.db_time
+        view['template_time'] += stats.template_time
+        view['cache_hits'] += stats.cache_hits
+        view['cache_misses'] += stats.cache_misses
+        view['buckets'][bucket] += 1
+    if time.monotonic() - _last_flush >= settings.PERF_FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Сохраняет гистограммы процесса в общий кэш."""
+    global _last_flush
+    with _lock:
+        snapshot = {name: dict(view) for name, view in _views.items()}
+        _last_flush = time.monotonic()
+    cache = caches[settings.PERF_CACHE]
+    pid = os.getpid()
+    cache.set(SNAPSHOT_KEY.format(pid), snapshot, PROCESS_TTL)
+    processes = cache.get(PROCESSES_KEY) or {}
+    if pid not in processes:
+        processes[pid] = time.time()
+        cache.set(PROCESSES_KEY, processes, None)
+
+
+def _percentile(buckets, rank):
+    """Оценка перцентиля сверху: граница корзины, куда он попал.
+
+    None — перцентиль больше последней границы.
+    """
+    total, seen = sum(buckets), 0
+    for bound, count in zip(BUCKETS, buckets):
+        seen += count
+        if seen >= total * rank / 100:
+            return bound
+    return None
+
+
+def perf_snapshot():
+    """Гистограммы всех процессов, сложенные по представлениям."""
+    flush()
+    cache = caches[settings.PERF_CACHE]
+    processes = cache.get(PROCESSES_KEY) or {}
+    snapshots = cache.get_many(
+        [SNAPSHOT_KEY.format(pid) for pid in processes]
+    )
+    alive = {
+        pid: started for pid, started in processes.items()
+        if SNAPSHOT_KEY.format(pid) in snapshots
+    }
+    if len(alive) < len(processes):
+        # Снимки завершённых процессов истекли: забываем их pid.
+        cache.set(PROCESSES_KEY, alive, None)
+    views = {}
+    for snapshot in snapshots.values():
+        for name, view in snapshot.items():
+            _merge(views.setdefault(name, _empty()), view)
+    for view in views.values():
+        requests = view['requests']
+        view.update({
+            'avg_ms': view['time'] * 1000 / requests,
+            'avg_queries': view['queries'] / requests,
+            'avg_db_ms': view['db_time'] * 1000 / requests,
+            'avg_template_ms': view['template_time'] * 1000 / requests,
+            **{
+                f'p{rank}_ms': _percentile(view['buckets'], rank)
+                for rank in (50, 95, 99)
+            },
+        })
+    return {
+        'processes': len(snapshots),
+        'buckets_ms': BUCKETS,
+        'views': views,
+    }
+
+
+def reset():
+    with _lock:
+        _views.clear()
+    cache = caches[settings.PERF_CACHE]
+    processes = cache.get(PROCESSES_KEY) or {}
+    cache.delete_many([SNAPSHOT_KEY.format(pid) for pid in processes])
+    cache.delete(PROCESSES_KEY)
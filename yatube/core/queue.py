@@ -0,0 +1,162 @@
+"""Надёжная очередь задач в SQLite-файле, общая для всех процессов.
+
+Задача хранится, пока обработчик не подтвердит её через ack(). Взятая,
+но не подтверждённая за CLAIM_TIMEOUT секунд задача (процесс упал)
+выдаётся снова, поэтому задачи должны быть идемпотентными. Одновременно
+в работе бывает только одна пачка: задачи выполняются строго по порядку.
+Задача, которая не выполнилась MAX_ATTEMPTS раз подряд, переносится
+в таблицу dead и больше не задерживает очередь.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CLAIM_TIMEOUT = 60
+MAX_ATTEMPTS = 5
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS queue ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, '
+    'kind TEXT NOT NULL, payload TEXT NOT NULL, claimed REAL, '
+    'attempts INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE IF NOT EXISTS dead ('
+    'id INTEGER PRIMARY KEY, key TEXT, kind TEXT NOT NULL, '
+    'payload TEXT NOT NULL, error TEXT, failed REAL NOT NULL)',
+)
+
+
+class SQLiteQueue:
+    def __init__(self, path, busy_timeout=5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого форка.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            columns = {
+                row[1] for row in connection.execute(
+                    'PRAGMA table_info(queue)'
+                )
+            }
+            # Файлы очереди, созданные до счётчика попыток.
+            if 'attempts' not in columns:
+                connection.execute(
+                    'ALTER TABLE queue '
+                    'ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0'
+                )
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def put(self, kind, payload, key=None):
+        """Добавляет задачу; задача с уже известным key не дублируется."""
+        cursor = self._connection.execute(
+            'INSERT OR IGNORE INTO queue (key, kind, payload) '
+            'VALUES (?, ?, ?)',
+            (key, kind, json.dumps(payload)),
+        )
+        return bool(cursor.rowcount)
+
+    def claim(self, limit):
+        """Берёт до limit старейших задач: [(id, kind, payload)].
+
+        Пока предыдущая пачка в работе, возвращает пустой список.
+        """
+        now = time.time()
+        stale = now - CLAIM_TIMEOUT
+        with self._transaction() as connection:
+            busy = connection.execute(
+                'SELECT 1 FROM queue WHERE claimed > ? LIMIT 1', (stale,)
+            ).fetchone()
+            if busy:
+                return []
+            rows = connection.execute(
+                'SELECT id, kind, payload FROM queue ORDER BY id LIMIT ?',
+                (limit,),
+            ).fetchall()
+            connection.executemany(
+                'UPDATE queue SET claimed = ? WHERE id = ?',
+                [(now, pk) for pk, kind, payload in rows],
+            )
+        return [(pk, kind, json.loads(payload)) for pk, kind, payload in rows]
+
+    def ack(self, ids):
+        with self._transaction() as connection:
+            connection.executemany(
+                'DELETE FROM queue WHERE id = ?', [(pk,) for pk in ids]
+            )
+
+    def release(self, ids):
+        """Возвращает взятые задачи в очередь, не дожидаясь таймаута."""
+        with self._transaction() as connection:
+            connection.executemany(
+                'UPDATE queue SET claimed = NULL WHERE id = ?',
+                [(pk,) for pk in ids],
+            )
+
+    def fail(self, pk, error):
+        """Возвращает задачу в очередь после ошибки.
+
+        После MAX_ATTEMPTS ошибок подряд переносит её в dead; тогда
+        возвращает True.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                'UPDATE queue SET claimed = NULL, attempts = attempts + 1 '
+                'WHERE id = ?', (pk,),
+            )
+            cursor = connection.execute(
+                'INSERT INTO dead (id, key, kind, payload, error, failed) '
+                'SELECT id, key, kind, payload, ?, ? FROM queue '
+                'WHERE id = ? AND attempts >= ?',
+                (error, time.time(), pk, MAX_ATTEMPTS),
+            )
+            if not cursor.rowcount:
+                return False
+            connection.execute('DELETE FROM queue WHERE id = ?', (pk,))
+        return True
+
+    def dead(self):
+        """Задачи, отложенные после MAX_ATTEMPTS ошибок: [(id, kind,
+        payload, error)]."""
+        rows = self._connection.execute(
+            'SELECT id, kind, payload, error FROM dead ORDER BY id'
+        ).fetchall()
+        return [
+            (pk, kind, json.loads(payload), error)
+            for pk, kind, payload, error in rows
+        ]
+
+    def __len__(self):
+        return self._connection.execute(
+            'SELECT count(*) FROM queue'
+        ).fetchone()[0]
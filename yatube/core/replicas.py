@@ -0,0 +1,168 @@
+"""Чтение лент и страниц постов с реплик базы данных.
+
+Представления, помеченные read_from_replica, читают с одной из реплик
+из DATABASE_REPLICAS; всё остальное, включая любую запись, идёт в
+основную базу. Кто только что писал, REPLICA_PIN_SECONDS читает
+с основной базы и видит свои изменения, хотя реплика ещё отстаёт.
+Недоступная реплика выключается на REPLICA_RETRY_SECONDS.
+"""
+import functools
+import logging
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'primary_pin'
+
+_current = ContextVar('replica_request_state', default=None)
+# Реплика -> время (monotonic), до которого она считается недоступной.
+_down_until = {}
+
+
+class RequestState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.reading = False
+        self.wrote = False
+        self.alias = None
+
+    @property
+    def use_replica(self):
+        return self.reading and not (self.pinned or self.wrote)
+
+
+def current():
+    return _current.get()
+
+
+def replica_used():
+    """Читал ли текущий запрос с реплики: его данные могут отставать."""
+    state = current()
+    return state is not None and state.alias not in (None, DEFAULT_DB_ALIAS)
+
+
+@contextmanager
+def request_state(pinned=False):
+    state = RequestState(pinned)
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+def sqlite_path(settings_dict):
+    """Путь к файлу SQLite, в том числе заданному URI вида file:...?mode=ro."""
+    name = settings_dict['NAME']
+    if name.startswith('file:'):
+        return unquote(urlparse(name).path)
+    return name
+
+
+def sync_sqlite(alias, source=DEFAULT_DB_ALIAS):
+    """Копирует основную базу SQLite в файл реплики.
+
+    Копия собирается рядом и подменяет файл реплики атомарно: открытые
+    соединения дочитывают старую версию, новые видят новую.
+    """
+    target = sqlite_path(connections[alias].settings_dict)
+    temporary = f'{target}.sync'
+    primary = sqlite3.connect(sqlite_path(connections[source].settings_dict))
+    copy = sqlite3.connect(temporary)
+    try:
+        primary.backup(copy)
+        # Реплику открывают только на чтение, а такой файл в режиме WAL
+        # не открыть без служебных -wal и -shm.
+        copy.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        copy.close()
+        primary.close()
+    os.replace(temporary, target)
+
+
+def mark_down(alias):
+    _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def is_available(alias):
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning('Реплика %s недоступна', alias, exc_info=True)
+        mark_down(alias)
+        return False
+    return True
+
+
+def choose_replica():
+    """Доступная реплика или основная база, если таких нет."""
+    aliases = [
+        alias for alias in settings.DATABASE_REPLICAS if is_available(alias)
+    ]
+    return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+
+def read_from_replica(view):
+    """Читать в представлении с реплики.
+
+    Представление только читает, поэтому при ошибке реплики его можно
+    безопасно повторить на основной базе.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = current()
+        if state is None or state.pinned:
+            return view(request, *args, **kwargs)
+        state.reading = True
+        try:
+            return view(request, *args, **kwargs)
+        except DatabaseError:
+            if state.alias in (None, DEFAULT_DB_ALIAS):
+                raise
+            logger.warning(
+                'Ошибка реплики %s, повторяем на основной базе', state.alias,
+                exc_info=True,
+            )
+            mark_down(state.alias)
+            state.reading, state.alias = False, None
+            return view(request, *args, **kwargs)
+        finally:
+            state.reading = False
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current()
+        if state is None or not state.use_replica:
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            # Одна реплика на весь запрос: ответ не смешивает данные
+            # реплик с разным отставанием.
+            state.alias = choose_replica()
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = current()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными.
+        return db == DEFAULT_DB_ALIAS
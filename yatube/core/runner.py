@@ -0,0 +1,33 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """Тесты падают, если представление превысило бюджет SQL-запросов.
+
+    Общий кэш на время прогона переезжает во временный каталог: тесты
+    не видят версий лент от разработки и не стирают кэш разработчика.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        self.cache_directory = tempfile.mkdtemp(prefix='yatube-cache-')
+        caches = copy.deepcopy(settings.CACHES)
+        caches['shared'] = {
+            **caches['shared'],
+            'LOCATION': os.path.join(self.cache_directory, 'shared.sqlite3'),
+        }
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core import chrome
+from core.db.sqlite3.base import is_read_only
+
+# Эти настройки хранятся в самом файле базы, и на реплике, открытой
+# только для чтения, их не поменять.
+FILE_PRAGMAS = ('journal_mode',)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    read_only = is_read_only(connection.settings_dict)
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            if read_only and name in FILE_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(setting_changed)
+def reset_chrome(sender, setting, **kwargs):
+    if setting in ('ROOT_URLCONF', 'STATIC_URL', 'TEMPLATES',
+                   'TEMPLATE_CACHE'):
+        chrome.reset()
@@ -0,0 +1,23 @@
+from django import template
+from django.contrib.auth.models import AnonymousUser
+
+from core import chrome
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def header(context):
+    return chrome.header(
+        context.get('request'), context.get('user') or AnonymousUser()
+    )
+
+
+@register.simple_tag(takes_context=True)
+def footer(context):
+    return chrome.footer(context.get('year'))
+
+
+@register.simple_tag
+def nav_url(name):
+    return chrome.nav_url(name)
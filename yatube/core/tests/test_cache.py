@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.cache import sqlite
+from core.cache.sqlite import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """Общий кэш на SQLite-файле."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': options},
+        )
+
+    def test_get_set_delete(self):
+        values = {'str': 'строка', 'int': 7, 'none': None, 'list': [1, 'a']}
+        for key, value in values.items():
+            with self.subTest(key=key):
+                self.cache.set(key, value)
+                self.assertEqual(self.cache.get(key, 'нет'), value)
+        self.cache.delete('str')
+        self.assertIsNone(self.cache.get('str'))
+
+    def test_expired_entry_is_missing(self):
+        self.cache.set('key', 'value', timeout=1)
+        with mock.patch.object(sqlite.time, 'time',
+                               return_value=time.time() + 2):
+            self.assertIsNone(self.cache.get('key'))
+            self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'other'))
+
+    def test_get_many_set_many(self):
+        self.cache = self.make_cache(MAX_ENTRIES=1000)
+        self.cache.set_many({f'key{i}': i for i in range(600)})
+        found = self.cache.get_many([f'key{i}' for i in range(0, 700, 7)])
+        self.assertEqual(found, {f'key{i}': i for i in range(0, 600, 7)})
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_incr_is_atomic(self):
+        self.cache.set('counter', 0)
+
+        def worker():
+            cache = self.make_cache()
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_version(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.incr_version('key'), 2)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', version=2), 'value')
+
+    @mock.patch.object(sqlite, 'CULL_CHECK_EVERY', 1)
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        now = time.time()
+        for i in range(3):
+            with mock.patch.object(sqlite.time, 'time', return_value=now + i):
+                cache.set(f'key{i}', i)
+        with mock.patch.object(sqlite.time, 'time', return_value=now + 10):
+            cache.get('key0')
+            cache.set('key3', 3)
+        self.assertEqual(
+            cache.get_many(['key0', 'key1', 'key2', 'key3']),
+            {'key0': 0, 'key2': 2, 'key3': 3},
+        )
+
+    def test_tests_do_not_touch_developer_cache(self):
+        """Тестовый прогон пишет общий кэш во временный каталог."""
+        self.assertFalse(
+            caches['shared'].path.startswith(settings.BASE_DIR)
+        )
@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import chrome
+
+User = get_user_model()
+
+
+@override_settings(TEMPLATE_CACHE=True)
+class ChromeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='<b>second</b>')
+
+    def setUp(self):
+        chrome.reset()
+
+    def get(self, user, url):
+        client = Client()
+        if user:
+            client.force_login(user)
+        return client.get(url).content.decode()
+
+    def test_header_matches_uncached_render(self):
+        url = reverse('about:author')
+        with override_settings(TEMPLATE_CACHE=False):
+            expected = self.get(self.first, url)
+        self.assertEqual(self.get(self.first, url), expected)
+        self.assertIn('Пользователь: first', expected)
+
+    def test_header_is_rendered_once_per_auth_state_and_view(self):
+        url = reverse('about:tech')
+        with mock.patch.object(
+            chrome, 'get_template', wraps=chrome.get_template
+        ) as get_template:
+            self.get(self.first, url)
+            second = self.get(self.second, url)
+            self.get(None, url)
+        self.assertEqual(
+            [call.args[0] for call in get_template.call_args_list],
+            [chrome.HEADER, chrome.FOOTER, chrome.HEADER],
+        )
+        self.assertIn('&lt;b&gt;second&lt;/b&gt;', second)
+        self.assertNotIn('first', second)
+        self.assertNotIn(chrome.USERNAME, second)
+
+    def test_active_item_follows_view(self):
+        html = self.get(None, reverse('users:login'))
+        self.assertIn(
+            f'active"\n          href="{reverse("users:login")}"', html
+        )
+        html = self.get(None, reverse('users:signup'))
+        self.assertNotIn(
+            f'active"\n          href="{reverse("users:login")}"', html
+        )
+
+    def test_nav_url_matches_reverse(self):
+        self.assertEqual(chrome.nav_url('posts:index'), reverse('posts:index'))
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import perf
+from core.middleware import QueryBudgetExceeded
+
+User = get_user_model()
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Стоимость запросов по представлениям и бюджеты SQL."""
+    def setUp(self):
+        caches['shared'].clear()
+        perf.reset()
+        self.client = Client()
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;desc='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_server_timing_is_staff_only_when_disabled(self):
+        url = reverse('posts:index')
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.client.force_login(
+            User.objects.create_user(username='user'))
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True))
+        self.assertIn('Server-Timing', self.client.get(url))
+
+    def test_cache_hits_and_misses(self):
+        cache = caches['default']
+        cache.set('hit', 1)
+        with perf.collect() as stats:
+            cache.get('hit')
+            cache.get('miss')
+            cache.get_many(['hit', 'miss', 'other'])
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 3))
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 0})
+    def test_budget_fails_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_STRICT=False
+    )
+    def test_budget_is_logged(self):
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index', logs.output[0])
+
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse('perf_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        views = self.client.get(url).json()['views']
+        index = views['posts:index']
+        self.assertEqual(index['requests'], 3)
+        self.assertEqual(sum(index['buckets']), 3)
+        self.assertGreater(index['avg_queries'], 0)
+        self.assertGreater(index['avg_template_ms'], 0)
+        self.assertIsNotNone(index['p95_ms'])
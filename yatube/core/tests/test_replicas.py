@@ -0,0 +1,112 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import OperationalError, connections
+from django.test import (
+    Client, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import replicas
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Ленты читаются с реплики, запись и следующие за ней чтения — нет."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        caches['shared'].clear()
+        replicas._down_until.clear()
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_read_only_views_use_replica(self):
+        post = Post.objects.create(author=self.user, text='Пост')
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                self.assertGreater(self.get(url)[1], 0)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.get(reverse('posts:index'))[1], 0)
+        self.client.cookies.pop(replicas.PIN_COOKIE)
+        self.assertGreater(self.get(reverse('posts:index'))[1], 0)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_pages_from_replica_are_not_cached(self):
+        """Реплика может отставать: такие страницы в кэш не попадают."""
+        self.client.logout()
+        for _ in range(2):
+            self.assertGreater(self.get(reverse('posts:index'))[1], 0)
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        with mock.patch.object(
+            connections['replica'], 'ensure_connection',
+            side_effect=OperationalError('нет реплики'),
+        ), self.assertLogs('core.replicas', 'WARNING'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        # Реплика выключена на REPLICA_RETRY_SECONDS.
+        self.assertEqual(self.get(reverse('posts:index'))[1], 0)
+
+    def test_replica_error_retries_on_primary(self):
+        def broken_cursor(*args, **kwargs):
+            raise OperationalError('реплика упала')
+
+        with mock.patch.object(
+            connections['replica'], 'cursor', broken_cursor
+        ), self.assertLogs('core.replicas', 'WARNING'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(reverse('posts:index'))[1], 0)
+
+
+class SyncSqliteTests(SimpleTestCase):
+    def test_copies_primary_into_read_only_replica(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        primary = os.path.join(directory, 'primary.sqlite3')
+        replica = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(primary) as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE post (text TEXT)')
+            db.execute("INSERT INTO post VALUES ('пост')")
+        settings_dicts = {
+            'default': {'NAME': primary},
+            'replica': {'NAME': f'file:{replica}?mode=ro'},
+        }
+        with mock.patch.object(replicas, 'connections', {
+            alias: mock.Mock(settings_dict=value)
+            for alias, value in settings_dicts.items()
+        }):
+            replicas.sync_sqlite('replica')
+        copy = sqlite3.connect(f'file:{replica}?mode=ro', uri=True)
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute('SELECT text FROM post').fetchall(),
+                         [('пост',)])
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group
+
+User = get_user_model()
+
+
+class SqlitePragmasTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL.
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class ImmediateTransactionTests(TransactionTestCase):
+    def test_atomic_starts_immediate_transaction(self):
+        with CaptureQueriesContext(connection) as captured:
+            with transaction.atomic():
+                Group.objects.create(title='Группа', slug='group')
+        self.assertEqual(captured[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_views_without_writes_take_no_write_lock(self):
+        user = User.objects.create_user(username='user')
+        client = Client()
+        client.force_login(user)
+        requests = (
+            ('get', reverse('posts:post_create'), {}),
+            ('post', reverse('posts:post_create'), {'text': ''}),
+            ('get', reverse('posts:profile_follow', args=['user']), {}),
+        )
+        for method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                with CaptureQueriesContext(connection) as captured:
+                    getattr(client, method)(url, data)
+                self.assertNotIn(
+                    'BEGIN IMMEDIATE',
+                    [query['sql'] for query in captured],
+                )
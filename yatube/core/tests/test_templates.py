@@ -0,0 +1,51 @@
+import copy
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from core.template_backends import template_names, warm_up
+
+
+class WarmUpTests(SimpleTestCase):
+    def broken_templates(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(f'{directory}/broken.html', 'w') as file:
+            file.write('{% if %}')
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['DIRS'] = [directory]
+        return override_settings(TEMPLATES=templates)
+
+    def test_project_templates_are_found(self):
+        names = template_names(engines.all()[0].engine)
+        self.assertIn('posts/index.html', names)
+        self.assertIn('posts/includes/paginator.html', names)
+
+    def test_all_templates_compile(self):
+        self.assertGreater(warm_up(), 0)
+
+    def test_cached_loader_keeps_compiled_templates(self):
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['OPTIONS']['loaders'] = [(
+            'django.template.loaders.cached.Loader',
+            settings.TEMPLATE_LOADERS,
+        )]
+        with override_settings(TEMPLATES=templates):
+            warm_up()
+            engine = engines.all()[0].engine
+            self.assertIs(
+                engine.get_template('base.html'),
+                engine.get_template('base.html'),
+            )
+
+    def test_broken_template_is_reported(self):
+        with self.broken_templates():
+            with self.assertRaisesMessage(ImproperlyConfigured, 'broken'):
+                warm_up()
+            with self.assertRaises(CommandError):
+                call_command('compile_templates')
@@ -0,0 +1,140 @@
+"""JSON-версии лент и страницы поста для мобильных клиентов.
+
+Ответы собираются из values() без шаблонов. ETag и Last-Modified
+считаются по версиям лент из общего кэша, поэтому на условный запрос
+без изменений сервер отвечает 304, не читая таблицу постов.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .caching import CACHE_ALIAS, VERSION_KEY, feed_key, feed_last_modified
+from .models import Group, Post, User
+from .timelines import follow_feed
+from .utilits import paginator
+
+POST_FIELDS = (
+    'pk', 'text', 'pub_date', 'image', 'author__username', 'group__slug',
+    'comments_count',
+)
+
+
+def serialize_post(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+    }
+
+
+def feed_response(request, post_list, feed):
+    page = paginator(request, post_list.values(*POST_FIELDS), count_key=feed)
+    return JsonResponse({
+        'posts': [serialize_post(row) for row in page],
+        'next': page.next_cursor or None,
+        'previous': page.previous_cursor or None,
+    })
+
+
+def conditional(scopes):
+    """Отвечает 304, если версии лент scopes(request, ...) не менялись.
+
+    Представление получает ключ ленты вторым аргументом.
+    """
+    def decorator(view):
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            view_scopes = scopes(request, *args, **kwargs)
+            feed = feed_key(*view_scopes)
+            raw = f'{feed}?{request.GET.urlencode()}'.encode()
+            etag = quote_etag(hashlib.md5(raw).hexdigest())
+            last_modified = int(
+                feed_last_modified(*view_scopes).timestamp()
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, feed, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@conditional(lambda request: ['index'])
+def index(request, feed):
+    return feed_response(request, Post.objects.all(), feed)
+
+
+def group_scopes(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return [f'group:{group.pk}']
+
+
+@conditional(group_scopes)
+def group_posts(request, feed, slug):
+    return feed_response(
+        request, Post.objects.filter(group__slug=slug), feed
+    )
+
+
+def profile_scopes(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return [f'profile:{author.pk}']
+
+
+@conditional(profile_scopes)
+def profile(request, feed, username):
+    return feed_response(
+        request, Post.objects.filter(author__username=username), feed
+    )
+
+
+@login_required
+@conditional(lambda request: ['index', f'follow:{request.user.pk}'])
+def follow_index(request, feed):
+    return feed_response(request, follow_feed(request.user), feed)
+
+
+def post_detail_scopes(request, post_id):
+    scope = f'post:{post_id}'
+    # Ключ версии есть, только если пост существовал, поэтому таблицу
+    # постов читаем лишь без ключа. Для произвольных id ключи не
+    # заводятся: иначе они вытеснили бы из кэша рабочие.
+    if caches[CACHE_ALIAS].get(VERSION_KEY.format(scope)) is None:
+        get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return [scope]
+
+
+@conditional(post_detail_scopes)
+def post_detail(request, feed, post_id):
+    row = Post.objects.filter(pk=post_id).values(*POST_FIELDS).first()
+    if row is None:
+        raise Http404
+    return JsonResponse(serialize_post(row))
@@ -0,0 +1,304 @@
+"""Бенчмарки основных путей приложения posts на синтетических данных.
+
+Каждый сценарий — функция без аргументов: представления вызываются
+напрямую через RequestFactory, без middleware. Для сценария считается
+лучшее время и число SQL-запросов после прогрева. Результаты
+сохраняются в JSON и сравниваются с сохранённой базовой линией.
+"""
+import copy
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from . import thumbnails, views
+from .caching import feed_key
+from .generator import generate
+from .models import Follow, Group, Post, UserCounters
+from .timelines import follow_feed
+from .utilits import paginator
+
+# Размеры наборов данных: аргументы generate().
+SIZES = {
+    'small': dict(
+        users=50, groups=5, posts=2000, comments=5000, follows=500
+    ),
+    'medium': dict(
+        users=500, groups=20, posts=20000, comments=50000, follows=5000
+    ),
+    'large': dict(
+        users=5000, groups=100, posts=200000, comments=500000,
+        follows=50000,
+    ),
+}
+SEED = 2022
+REPEAT = 20
+WARMUP = 1
+# Допустимое замедление относительно базовой линии.
+THRESHOLD = 0.25
+# Разница меньше этой считается шумом таймера, мс.
+NOISE_MS = 1.0
+IMAGE_SIZE = (1600, 900)
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+# Базовые линии лежат рядом с pytest-набором benchmarks/ в корне репозитория.
+BASELINE_DIR = os.path.join(os.path.dirname(settings.BASE_DIR), 'benchmarks')
+
+
+def baseline_path(size):
+    return os.path.join(BASELINE_DIR, f'baseline_{size}.json')
+
+
+def seed(size):
+    generate(**SIZES[size], seed=SEED)
+
+
+@contextmanager
+def isolated():
+    """Временные MEDIA_ROOT и файл общего кэша для прогона."""
+    with tempfile.TemporaryDirectory() as directory:
+        caches = copy.deepcopy(settings.CACHES)
+        caches['shared'] = {
+            **caches['shared'],
+            'LOCATION': os.path.join(directory, 'shared.sqlite3'),
+        }
+        with override_settings(
+            MEDIA_ROOT=directory, CACHES=caches,
+            THUMBNAIL_PREGENERATE_ASYNC=False,
+        ):
+            yield
+
+
+def _request(user=None, method='get', path='/', data=None):
+    request = getattr(RequestFactory(), method)(path, data or {})
+    request.user = user or AnonymousUser()
+    return request
+
+
+def _images(count):
+    """Картинки для генерации миниатюр: на каждый вызов новая."""
+    names = []
+    for number in range(count):
+        buffer = io.BytesIO()
+        Image.effect_noise(IMAGE_SIZE, 64).convert('RGB').save(buffer, 'JPEG')
+        names.append(default_storage.save(
+            f'benchmarks/image_{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return iter(names)
+
+
+def _consume(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def cases(repeat=REPEAT, warmup=WARMUP):
+    """Сценарии {имя: функция} на самых тяжёлых объектах набора."""
+    author = UserCounters.objects.select_related('user').order_by(
+        '-posts_count'
+    ).first().user
+    reader = UserCounters.objects.select_related('user').order_by(
+        '-following_count'
+    ).first().user
+    staff = copy.copy(reader)
+    staff.is_staff = True
+    group = Group.objects.order_by('pk').first()
+    post = Post.objects.filter(author=author).order_by('-pub_date').first()
+    discussed = Post.objects.order_by('-comments_count').first()
+    word = post.text.split()[0]
+    last_page = (Post.objects.count() - 1) // 10 + 1
+    images = _images(repeat + warmup)
+
+    def follow_pair():
+        views.profile_follow(
+            _request(reader, 'post'), username=author.username
+        )
+        views.profile_unfollow(
+            _request(reader, 'post'), username=author.username
+        )
+
+    def deep_page():
+        request = _request(data={'page': last_page})
+        page = paginator(request, Post.objects.feed(), count_key=feed_key(
+            'index'
+        ))
+        return list(page)
+
+    return {
+        'views.index': lambda: views.index(_request()),
+        'views.group_posts': lambda: views.group_posts(
+            _request(), slug=group.slug
+        ),
+        'views.profile': lambda: views.profile(
+            _request(), username=author.username
+        ),
+        'views.post_detail': lambda: views.post_detail(
+            _request(), post_id=post.pk
+        ),
+        'views.post_create': lambda: views.post_create(_request(author)),
+        'views.post_edit': lambda: views.post_edit(
+            _request(author), post_id=post.pk
+        ),
+        'views.post_comments': lambda: views.post_comments(
+            _request(), post_id=discussed.pk
+        ),
+        'views.add_comment': lambda: views.add_comment(
+            _request(reader, 'post', data={'text': 'Комментарий'}),
+            post_id=discussed.pk,
+        ),
+        'views.search': lambda: views.search(_request(data={'q': word})),
+        'views.follow_index': lambda: views.follow_index(_request(reader)),
+        'views.profile_follow': follow_pair,
+        'views.export': lambda: _consume(views.export(
+            _request(staff, data={'model': 'groups'})
+        )),
+        'comments.render': lambda: views.post_detail(
+            _request(), post_id=discussed.pk
+        ),
+        'paginator.deep_page': deep_page,
+        'follow.exists': lambda: Follow.objects.filter(
+            user=reader, author=author
+        ).exists(),
+        'follow.feed': lambda: list(follow_feed(reader)[:10]),
+        'thumbnails.generate': lambda: thumbnails.generate(next(images)),
+    }
+
+
+def _reference():
+    """Эталонная работа, на время которой нормируются результаты."""
+    return sorted(str(number * 7919 % 10007) for number in range(5000))
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def measure(func, repeat=REPEAT, warmup=WARMUP):
+    """Время (мс) и наибольшее число запросов за прогон.
+
+    Берётся лучшее время: оно меньше всего зависит от соседней нагрузки.
+    Вперемешку с повторами меряется эталонная работа (calibration_ms),
+    чтобы сравнивать прогоны на машинах разной скорости.
+    """
+    for _ in range(warmup):
+        func()
+    timings, references, queries = [], [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            timings.append(_timed(func))
+        queries.append(len(captured))
+        references.append(_timed(_reference))
+    return {
+        'time_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'calibration_ms': round(min(references), 3),
+        'queries': max(queries),
+    }
+
+
+def run(size, repeat=REPEAT, warmup=WARMUP, only=None, log=None):
+    """Засевает данные размера size и прогоняет сценарии.
+
+    Ожидает пустую (тестовую) базу.
+    """
+    log = log or (lambda message: None)
+    with isolated():
+        seed(size)
+        results = {}
+        for name, func in cases(repeat, warmup).items():
+            if only and name not in only:
+                continue
+            results[name] = measure(func, repeat, warmup)
+            log(f'{name}: {results[name]}')
+    return {
+        'size': size,
+        'repeat': repeat,
+        'dataset': SIZES[size],
+        'results': results,
+    }
+
+
+def template_modes():
+    """Настройки TEMPLATES без кэша скомпилированных шаблонов и с ним."""
+    modes = {}
+    for name, loaders in (
+        ('uncached', settings.TEMPLATE_LOADERS),
+        ('cached', [(CACHED_LOADER, settings.TEMPLATE_LOADERS)]),
+    ):
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['OPTIONS']['loaders'] = loaders
+        modes[name] = templates
+    return modes
+
+
+def run_templates(size, repeat=REPEAT, warmup=WARMUP, log=None):
+    """Время views.index с разбором шаблонов на каждый запрос и без него."""
+    log = log or (lambda message: None)
+    results = {}
+    with isolated():
+        seed(size)
+        for name, templates in template_modes().items():
+            with override_settings(TEMPLATES=templates):
+                results[name] = measure(
+                    lambda: views.index(_request()), repeat, warmup
+                )
+            log(f'{name}: {results[name]}')
+    return results
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    """Регрессии report относительно baseline: список описаний.
+
+    Число запросов детерминировано, поэтому любой рост — регрессия.
+    Время приводится к скорости машины базовой линии и сравнивается
+    с допуском threshold.
+    """
+    if baseline.get('size') != report['size']:
+        raise ValueError(
+            f'Базовая линия снята на наборе {baseline.get("size")}, '
+            f'а прогон — на {report["size"]}'
+        )
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: {result["queries"]} SQL-запросов '
+                f'вместо {base["queries"]}'
+            )
+        scale = base['calibration_ms'] / result['calibration_ms']
+        slower = result['time_ms'] * scale - base['time_ms']
+        if slower > NOISE_MS and slower > base['time_ms'] * threshold:
+            regressions.append(
+                f'{name}: {result["time_ms"] * scale:.1f} мс вместо '
+                f'{base["time_ms"]:.1f} мс '
+                f'(+{slower / base["time_ms"]:.0%})'
+            )
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+        file.write('\n')
@@ -0,0 +1,110 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.core.cache import caches
+from django.db import transaction
+
+CACHE_ALIAS = 'shared'
+VERSION_KEY = 'feed:version:{}'
+MODIFIED_KEY = 'feed:modified:{}'
+
+# Версии лент, прочитанные за время рендера страницы: от них зависит
+# закэшированная страница целиком.
+_dependencies = ContextVar('feed_dependencies', default=None)
+
+
+def _initial_version():
+    # Версия по времени: если ключ вытеснен из кэша, новая версия
+    # не совпадёт ни с одной из уже закэшированных.
+    return int(time.time() * 1000)
+
+
+def post_scopes(author_id, group_id, post_id=None):
+    """Ленты, в которых показывается пост, и страница самого поста."""
+    scopes = ['index', f'profile:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    if post_id is not None:
+        scopes.append(f'post:{post_id}')
+    return scopes
+
+
+def feed_key(*scopes):
+    """Ключ ленты из версий всех областей, от которых она зависит."""
+    cache = caches[CACHE_ALIAS]
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    dependencies = _dependencies.get()
+    if dependencies is not None:
+        dependencies.update(
+            (scope, versions[key]) for scope, key in zip(scopes, keys)
+        )
+    return '.'.join(
+        f'{scope}={versions[key]}' for scope, key in zip(scopes, keys)
+    )
+
+
+def depends_on(*scopes):
+    """Отмечает, что рендер зависит от лент, не строя по ним ключ."""
+    feed_key(*scopes)
+
+
+@contextmanager
+def collect_dependencies():
+    """Собирает {лента: версия} всех лент, прочитанных в блоке."""
+    dependencies = {}
+    token = _dependencies.set(dependencies)
+    try:
+        yield dependencies
+    finally:
+        _dependencies.reset(token)
+
+
+def feed_last_modified(*scopes):
+    """Время последнего изменения лент, не обращаясь к таблице постов."""
+    cache = caches[CACHE_ALIAS]
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    modified = cache.get_many(keys)
+    for key in keys:
+        if key not in modified:
+            # Время изменения неизвестно: считаем, что лента изменилась
+            # сейчас, и запоминаем это до следующего изменения.
+            cache.add(key, time.time(), None)
+            modified[key] = cache.get(key)
+    return datetime.fromtimestamp(
+        int(max(modified.values())), timezone.utc
+    )
+
+
+def _bump(scopes):
+    cache = caches[CACHE_ALIAS]
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def bump_feed_version(*scopes):
+    """Инвалидирует все закэшированные страницы указанных лент.
+
+    Внутри транзакции версии повышаются дважды: сразу, чтобы код той же
+    транзакции не взял старую страницу, и после коммита. Иначе страница,
+    которую другой процесс отрендерил до коммита по старым данным, так
+    и осталась бы в кэше под новой версией.
+    """
+    scopes = set(scopes)
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
@@ -0,0 +1,68 @@
+"""Карточки постов в лентах: один шаблон и кэш готового HTML.
+
+Страница ленты собирается из карточек, отрендеренных по одной из
+словарей значений. Готовая карточка хранится в POST_CARD_CACHE под
+ключом из id и версии поста, поэтому неизменённый пост не рендерится
+заново, даже когда страница ленты сдвигается после нового поста.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .thumbnails import resolve_thumbnails
+
+TEMPLATE = 'posts/includes/post_card.html'
+CARD_KEY = 'post_card:{}:{}'
+
+
+def card_values(post, images=True):
+    """Всё, что показывает карточка, из поста ленты (Post.objects.feed)."""
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+        'author_username': post.author.username,
+        'author_name': post.author.get_full_name(),
+        'group_slug': post.group.slug if post.group_id else None,
+        'image_url': (
+            post.thumbnail.url if images and post.thumbnail else None
+        ),
+    }
+
+
+def card_version(values):
+    # Имя автора, группа и готовность миниатюры меняются без
+    # сохранения поста, поэтому тоже входят в версию.
+    related = (
+        values['author_username'], values['author_name'],
+        values['group_slug'], values['image_url'],
+    )
+    digest = hashlib.md5(repr(related).encode()).hexdigest()[:8]
+    return f'{values["updated"].timestamp():.6f}:{digest}'
+
+
+def render_cards(posts, images=True):
+    """HTML карточек страницы по порядку: из кэша, недостающие — рендером.
+
+    С images=False карточки без картинок и миниатюры не запрашиваются.
+    """
+    posts = list(posts)
+    if images:
+        resolve_thumbnails(posts)
+    cards = {}
+    for post in posts:
+        values = card_values(post, images)
+        cards[CARD_KEY.format(post.pk, card_version(values))] = values
+    cache = caches[settings.POST_CARD_CACHE]
+    html = cache.get_many(list(cards))
+    missing = [key for key in cards if key not in html]
+    if missing:
+        template = get_template(TEMPLATE)
+        rendered = {key: template.render(cards[key]) for key in missing}
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        html.update(rendered)
+    return [mark_safe(html[key]) for key in cards]
@@ -0,0 +1,123 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются сигналами в той же транзакции, что и сама запись,
+а reconcile() пересчитывает их пачками, если они разошлись с данными.
+"""
+import itertools
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+BATCH_SIZE = 1000
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def get_counters(user_id):
+    """Счётчики пользователя; для пользователя без записи — нули."""
+    return (
+        UserCounters.objects.filter(user_id=user_id).first()
+        or UserCounters(user_id=user_id)
+    )
+
+
+def change_user_counter(user_id, field, delta):
+    counters = UserCounters.objects.filter(user_id=user_id)
+    if delta < 0:
+        counters.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if counters.update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            UserCounters.objects.create(user_id=user_id, **{field: delta})
+    except IntegrityError:
+        change_user_counter(user_id, field, delta)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id, comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _count(model, field):
+    counted = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(Subquery(
+        counted.values(field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def _select(queryset, ids):
+    """Все строки или только строки с pk из ids, пачками по BATCH_SIZE."""
+    if ids is None:
+        yield queryset
+        return
+    ids = sorted(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield queryset.filter(pk__in=ids[start:start + BATCH_SIZE])
+
+
+def _reconcile_posts(ids=None):
+    fixed = []
+    for posts in _select(Post.objects.all(), ids):
+        drifted = posts.annotate(
+            real=_count(Comment, 'post')
+        ).exclude(comments_count=F('real')).only('comments_count')
+        for post in drifted.iterator():
+            post.comments_count = post.real
+            fixed.append(post)
+    Post.objects.bulk_update(fixed, ['comments_count'], BATCH_SIZE)
+    return len(fixed)
+
+
+def _reconcile_users(ids=None):
+    users = itertools.chain.from_iterable(
+        chunk.annotate(**{
+            field: _count(model, lookup)
+            for field, (model, lookup) in USER_COUNTERS.items()
+        }).values('pk', *USER_COUNTERS).order_by('pk').iterator()
+        for chunk in _select(User.objects.all(), ids)
+    )
+    fixed = 0
+    while True:
+        rows = list(itertools.islice(users, BATCH_SIZE))
+        if not rows:
+            return fixed
+        stored = UserCounters.objects.in_bulk([row['pk'] for row in rows])
+        created, updated = [], []
+        for row in rows:
+            real = {field: row[field] for field in USER_COUNTERS}
+            counters = stored.get(row['pk'])
+            if counters is None:
+                if any(real.values()):
+                    created.append(UserCounters(user_id=row['pk'], **real))
+            elif any(getattr(counters, field) != value
+                     for field, value in real.items()):
+                for field, value in real.items():
+                    setattr(counters, field, value)
+                updated.append(counters)
+        UserCounters.objects.bulk_create(created)
+        UserCounters.objects.bulk_update(updated, list(USER_COUNTERS))
+        fixed += len(created) + len(updated)
+
+
+def reconcile(users=None, posts=None):
+    """Исправляет расхождения; возвращает число исправленных строк.
+
+    Без аргументов проверяет все строки. Если передан хотя бы один
+    набор id, пересчитываются только эти пользователи и посты.
+    """
+    if users is not None or posts is not None:
+        users, posts = users or (), posts or ()
+    with transaction.atomic():
+        return _reconcile_posts(posts) + _reconcile_users(users)
@@ -16,6 +16,12 @@ class PostForm(forms.ModelForm):
 
 
 class CommentForm(forms.ModelForm):
+    # Заполняется при показе формы: повторная отправка той же формы
+    # не создаёт второй комментарий.
+    idempotency_key = forms.UUIDField(
+        required=False, widget=forms.HiddenInput
+    )
+
     class Meta:
         model = Comment
         fields = ('text',)
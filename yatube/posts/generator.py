@@ -0,0 +1,172 @@
+"""Генератор больших синтетических наборов данных для нагрузочных тестов.
+
+Авторы выбираются по закону Ципфа: немногие пишут большую часть постов
+и собирают большую часть подписчиков, как в настоящих соцсетях. Строки
+вставляются bulk_create с заранее назначенными id, поэтому связи между
+ними не требуют лишних запросов.
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from .counters import reconcile
+from .importer import keep_dates, refresh_derived
+from .models import Comment, Follow, Group, Post, User
+from .search import bulk_index
+
+BATCH_SIZE = 5000
+SENTENCES = 2000
+ZIPF_EXPONENT = 1.1
+PERIOD = timedelta(days=365)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _zipf_weights(count):
+    weights = [1 / rank ** ZIPF_EXPONENT for rank in range(1, count + 1)]
+    return list(itertools.accumulate(weights))
+
+
+class Generator:
+    def __init__(self, seed=None, batch_size=BATCH_SIZE, log=None):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        # Тексты собираются из готовых предложений: Faker на каждый
+        # из миллиона постов работал бы в десятки раз дольше.
+        self.sentences = [self.fake.sentence() for _ in range(SENTENCES)]
+
+    def text(self, low, high):
+        return ' '.join(
+            self.random.choices(self.sentences, k=self.random.randint(
+                low, high
+            ))
+        )
+
+    def _insert(self, model, objects):
+        inserted = 0
+        for batch in iter(
+            lambda: list(itertools.islice(objects, self.batch_size)), []
+        ):
+            with transaction.atomic(), keep_dates():
+                model.objects.bulk_create(batch)
+                if model is Post:
+                    bulk_index(batch)
+            inserted += len(batch)
+        self.log(f'{model.__name__}: {inserted}')
+
+    def users(self, count):
+        start = _next_id(User)
+        password = make_password(None)
+        self._insert(User, (
+            User(
+                pk=pk,
+                username=f'{self.fake.user_name()}_{pk}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for pk in range(start, start + count)
+        ))
+        return list(range(start, start + count))
+
+    def groups(self, count):
+        start = _next_id(Group)
+        self._insert(Group, (
+            Group(
+                pk=pk,
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{pk}',
+                description=self.text(1, 3),
+            )
+            for pk in range(start, start + count)
+        ))
+        return list(range(start, start + count))
+
+    def posts(self, count, authors, groups):
+        start = _next_id(Post)
+        weights = _zipf_weights(len(authors))
+        now = timezone.now()
+
+        def build(pk):
+            return Post(
+                pk=pk,
+                text=self.text(1, 8),
+                author_id=self.random.choices(
+                    authors, cum_weights=weights
+                )[0],
+                group_id=(
+                    self.random.choice(groups)
+                    if groups and self.random.random() < 0.5 else None
+                ),
+                pub_date=now - PERIOD * self.random.random(),
+            )
+
+        self._insert(Post, (build(pk) for pk in range(start, start + count)))
+        return range(start, start + count)
+
+    def comments(self, count, posts, users):
+        # Комментируют в основном популярные (здесь — первые) посты.
+        weights = _zipf_weights(min(len(posts), 10000))
+        now = timezone.now()
+        self._insert(Comment, (
+            Comment(
+                post_id=self.random.choices(
+                    posts[:len(weights)], cum_weights=weights
+                )[0],
+                author_id=self.random.choice(users),
+                text=self.text(1, 2),
+                created=now - PERIOD * self.random.random(),
+            )
+            for _ in range(count)
+        ))
+
+    def follows(self, count, users):
+        weights = _zipf_weights(len(users))
+        seen = set()
+
+        def build():
+            while len(seen) < count:
+                pair = (
+                    self.random.choice(users),
+                    self.random.choices(users, cum_weights=weights)[0],
+                )
+                if pair[0] != pair[1] and pair not in seen:
+                    seen.add(pair)
+                    yield Follow(user_id=pair[0], author_id=pair[1])
+
+        self._insert(Follow, build())
+        return {user for user, author in seen}
+
+
+def generate(users, groups, posts, comments, follows, seed=None,
+             batch_size=BATCH_SIZE, log=None):
+    """Создаёт набор данных и догоняет работу сигналов."""
+    if posts and not users:
+        raise ValueError('Постам нужны авторы: users должно быть больше 0')
+    generator = Generator(seed, batch_size, log)
+    user_ids = generator.users(users)
+    group_ids = generator.groups(groups)
+    post_ids = generator.posts(posts, user_ids, group_ids)
+    if post_ids:
+        generator.comments(comments, post_ids, user_ids)
+    followers = set()
+    if len(user_ids) > 1:
+        # Не больше половины всех возможных пар, иначе подбор пар
+        # по распределению Ципфа сходится слишком долго.
+        follows = min(follows, len(user_ids) * (len(user_ids) - 1) // 2)
+        followers = generator.follows(follows, user_ids)
+    reconcile()
+    # Ленты новых авторов и групп ещё никто не кэшировал: сбрасываем
+    # общую ленту и ленты подписчиков.
+    refresh_derived(followers=followers)
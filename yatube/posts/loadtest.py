@@ -0,0 +1,89 @@
+"""Нагрузочный прогон страниц внутри процесса через тестовый клиент.
+
+Для каждой страницы делает заданное число запросов и считает перцентили
+времени ответа и число SQL-запросов. Страницы выбираются самые тяжёлые:
+самый плодовитый автор, самый подписанный читатель, самый обсуждаемый
+пост.
+"""
+import math
+import time
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Group, Post, UserCounters
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль методом ближайшего ранга."""
+    values = sorted(values)
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+def pages():
+    """Адреса для прогона: {имя: (url, пользователь или None)}."""
+    author = UserCounters.objects.order_by('-posts_count').first()
+    reader = UserCounters.objects.order_by('-following_count').first()
+    group = Group.objects.order_by('pk').first()
+    post = Post.objects.order_by('-comments_count').only('text').first()
+    result = {
+        'index': (reverse('posts:index'), None),
+        'index_page_50': (reverse('posts:index') + '?page=50', None),
+        'api_index': (reverse('posts:api_index'), None),
+    }
+    if group is not None:
+        result['group_list'] = (
+            reverse('posts:group_list', args=[group.slug]), None
+        )
+    if author is not None:
+        result['profile'] = (
+            reverse('posts:profile', args=[author.user.username]), None
+        )
+    if reader is not None:
+        result['follow_index'] = (reverse('posts:follow_index'), reader.user)
+    if post is not None:
+        result['post_detail'] = (
+            reverse('posts:post_detail', args=[post.pk]), None
+        )
+        word = post.text.split()[0]
+        result['search'] = (reverse('posts:search') + f'?q={word}', None)
+    return result
+
+
+def measure(url, user=None, requests=50, warmup=1, cold=False):
+    """Время ответа (в секундах), число запросов к БД и коды ответов."""
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    for _ in range(warmup):
+        client.get(url)
+    timings, queries, statuses = [], [], set()
+    for _ in range(requests):
+        if cold:
+            for cache in caches.all():
+                cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+    return {
+        **{f'p{rank}': percentile(timings, rank) for rank in PERCENTILES},
+        'queries': max(queries),
+        'statuses': sorted(statuses),
+    }
+
+
+def run(requests=50, warmup=1, cold=False, only=None):
+    results = {}
+    for name, (url, user) in pages().items():
+        if only and name not in only:
+            continue
+        results[name] = measure(url, user, requests, warmup, cold)
+    return results
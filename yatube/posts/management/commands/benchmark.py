@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from posts.benchmarks import (
+    REPEAT, SIZES, THRESHOLD, WARMUP, baseline_path, compare, load, run,
+    run_templates, save,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарки приложения posts во временной базе: время и число '
+        'SQL-запросов, сравнение с базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cases', nargs='*',
+            help='Какие сценарии прогнать (по умолчанию все).'
+        )
+        parser.add_argument('--size', choices=SIZES, default='small')
+        parser.add_argument('--repeat', type=int, default=REPEAT)
+        parser.add_argument('--warmup', type=int, default=WARMUP)
+        parser.add_argument(
+            '-o', '--output', help='Сохранить результаты в JSON-файл.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Файл базовой линии (по умолчанию для --size).'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как новую базовую линию.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=THRESHOLD,
+            help='Допустимое замедление, доля от базовой линии.'
+        )
+        parser.add_argument(
+            '--templates', action='store_true',
+            help='Сравнить views.index без кэша шаблонов и с ним.'
+        )
+
+    def templates(self, options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_templates(
+                options['size'], options['repeat'], options['warmup'],
+                log=self.stderr.write,
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        for name, result in results.items():
+            self.stdout.write(f'{name:<24}{result["time_ms"]:>10.2f} мс')
+        saved = results['uncached']['time_ms'] - results['cached']['time_ms']
+        self.stdout.write(
+            f'Кэш шаблонов экономит {saved:.2f} мс '
+            f'({saved / results["uncached"]["time_ms"]:.0%}) на views.index'
+        )
+
+    def handle(self, *args, **options):
+        if options['templates']:
+            return self.templates(options)
+        baseline = options['baseline'] or baseline_path(options['size'])
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            report = run(
+                options['size'], options['repeat'], options['warmup'],
+                options['cases'], log=self.stderr.write,
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        self.stdout.write(f'{"сценарий":<24}{"мс":>10}{"запросов":>10}')
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f'{name:<24}{result["time_ms"]:>10.2f}'
+                f'{result["queries"]:>10}'
+            )
+        if options['output']:
+            save(report, options['output'])
+        if options['update_baseline']:
+            save(report, baseline)
+            self.stdout.write(f'Базовая линия записана в {baseline}')
+            return
+        try:
+            regressions = compare(
+                report, load(baseline), options['threshold']
+            )
+        except FileNotFoundError:
+            self.stdout.write(f'Нет базовой линии {baseline}')
+            return
+        except ValueError as error:
+            raise CommandError(error)
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write('Регрессий нет')
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (
+    CHUNK_SIZE, EXPORTS, FORMATS, lines, parse_since, rows, watermark
+)
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model', nargs='?', default='posts', choices=[*EXPORTS, 'all'],
+            help='Что выгружать; all — всё подряд, только в NDJSON.'
+        )
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--since', help='Выгрузить строки новее этой даты (водяной знак).'
+        )
+        parser.add_argument(
+            '--after-id', type=int,
+            help='id последней выгруженной строки (водяной знак).'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--output', '-o', help='Файл для выгрузки (по умолчанию stdout).'
+        )
+
+    def handle(self, *args, **options):
+        kinds = [options['model']]
+        if options['model'] == 'all':
+            if options['format'] == 'csv':
+                raise CommandError('CSV выгружается по одной модели.')
+            if options['since'] or options['after_id']:
+                raise CommandError('Водяной знак задаётся для одной модели.')
+            kinds = list(EXPORTS)
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError as error:
+                raise CommandError(error)
+        stream, write = None, self.write_stdout
+        if options['output']:
+            stream = open(
+                options['output'], 'w', encoding='utf-8', newline=''
+            )
+            write = stream.write
+        try:
+            for kind in kinds:
+                self.export(kind, since, options, write)
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def write_stdout(self, line):
+        self.stdout.write(line, ending='')
+
+    def export(self, kind, since, options, write):
+        last = None
+
+        def tracked(source):
+            nonlocal last
+            for row in source:
+                last = row
+                yield row
+
+        source = rows(
+            kind, since, options['after_id'], options['chunk_size']
+        )
+        for line in lines(kind, tracked(source), options['format']):
+            write(line)
+        if last is not None:
+            date, pk = watermark(kind, last)
+            mark = f'--after-id={pk}'
+            if date is not None:
+                mark = f'--since="{date.isoformat()}" {mark}'
+            self.stderr.write(f'{kind}: продолжить выгрузку с {mark}')
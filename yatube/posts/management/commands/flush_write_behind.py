@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import writebehind
+
+
+class Command(BaseCommand):
+    help = 'Записывает в базу все отложенные комментарии и подписки.'
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            written = writebehind.flush()
+            if not written:
+                break
+            total += written
+        self.stdout.write(
+            f'Записано: {total}, в очереди: {len(writebehind.get_queue())}'
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.generator import BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = 'Создаёт синтетический набор данных для нагрузочных тестов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument(
+            '--seed', type=int, help='Зерно генератора для повторяемости.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        generate(
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            f'Готово за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import EXPORTS, FORMATS
+from posts.importer import BATCH_SIZE, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = 'Импортирует выгрузку export_posts (NDJSON или CSV) пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или - для stdin.')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--model', choices=list(EXPORTS),
+            help='Модель строк без поля model (обязательно для CSV).'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <path>.checkpoint).'
+        )
+
+    def handle(self, *args, **options):
+        if options['format'] == 'csv' and not options['model']:
+            raise CommandError('Для CSV укажите --model.')
+        path = options['path']
+        checkpoint = options['checkpoint']
+        if checkpoint is None and path != '-':
+            checkpoint = f'{path}.checkpoint'
+        done, affected = self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write(f'Продолжаем после строки {done}')
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        importer = Importer(options['batch_size'])
+        # Строки до контрольной точки уже вставлены, но ленты и счётчики
+        # по ним пересчитываются только в конце.
+        importer.restore(affected)
+        records = (
+            record for record in read_records(
+                stream, options['format'], options['model']
+            )
+            if record[0] > done
+        )
+        started, processed = time.monotonic(), 0
+        try:
+            for line, count in importer.run(records):
+                processed += count
+                self.write_checkpoint(checkpoint, line, importer.affected())
+                self.report(processed, started)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        importer.refresh()
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        for number, reason in importer.rejected:
+            self.stderr.write(f'Строка {number}: {reason}')
+        self.stdout.write(
+            f'Импортировано: {importer.imported}, '
+            f'пропущено как уже существующие: {importer.skipped}, '
+            f'отклонено: {len(importer.rejected)}'
+        )
+        self.report(processed, started)
+
+    def read_checkpoint(self, checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0, {}
+        with open(checkpoint) as file:
+            state = json.loads(file.read().strip() or '0')
+        # Старые контрольные точки хранили только номер строки.
+        if isinstance(state, int):
+            return state, {}
+        return state['line'], state['affected']
+
+    def write_checkpoint(self, checkpoint, line, affected):
+        if not checkpoint:
+            return
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'line': line, 'affected': affected}, file)
+        os.replace(temporary, checkpoint)
+
+    def report(self, processed, started):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Обработано строк: {processed} за {elapsed:.1f} с '
+            f'({rate:.0f} строк/с)'
+        )
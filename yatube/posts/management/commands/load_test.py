@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts.loadtest import PERCENTILES, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон страниц тестовым клиентом: перцентили времени '
+        'ответа и число SQL-запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'pages', nargs='*',
+            help='Какие страницы прогнать (по умолчанию все).'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэши перед каждым запросом.'
+        )
+
+    def handle(self, *args, **options):
+        results = run(
+            options['requests'], options['warmup'], options['cold'],
+            options['pages'],
+        )
+        header = f'{"страница":<16}' + ''.join(
+            f'{f"p{rank}, мс":>12}' for rank in PERCENTILES
+        ) + f'{"запросов":>10}{"коды":>10}'
+        self.stdout.write(header)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<16}'
+                + ''.join(
+                    f'{result[f"p{rank}"] * 1000:>12.1f}'
+                    for rank in PERCENTILES
+                )
+                + f'{result["queries"]:>10}'
+                + f'{",".join(map(str, result["statuses"])):>10}'
+            )
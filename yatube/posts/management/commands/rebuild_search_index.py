@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import index_post
+
+
+class Command(BaseCommand):
+    help = 'Переиндексирует тексты всех постов для поиска.'
+
+    def handle(self, *args, **options):
+        total = 0
+        for post in Post.objects.only('text').iterator():
+            index_post(post)
+            total += 1
+        self.stdout.write(f'Проиндексировано постов: {total}')
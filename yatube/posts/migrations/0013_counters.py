@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:15
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    comments = Comment.objects.values('post_id').annotate(
+        total=models.Count('pk')).order_by()
+    for row in comments:
+        Post.objects.filter(pk=row['post_id']).update(
+            comments_count=row['total'])
+    counters = defaultdict(dict)
+    sources = (
+        ('posts_count', Post.objects, 'author_id'),
+        ('followers_count', Follow.objects, 'author_id'),
+        ('following_count', Follow.objects, 'user_id'),
+    )
+    for field, objects, key in sources:
+        rows = objects.values(key).annotate(
+            total=models.Count('pk')).order_by()
+        for row in rows:
+            counters[row[key]][field] = row['total']
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id, **values)
+        for user_id, values in counters.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
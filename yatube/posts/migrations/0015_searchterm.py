@@ -0,0 +1,73 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:25
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+import snowballstemmer
+
+# Токенизатор posts.search на момент миграции. Он скопирован сюда, чтобы
+# изменения в живом коде не меняли и не ломали эту миграцию; индекс по
+# новым правилам пересобирает manage.py rebuild_search_index.
+MAX_OCCURRENCES = 99
+MAX_TERM_LENGTH = 64
+WORD_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'все', 'да', 'для', 'до', 'его',
+    'ее', 'если', 'есть', 'же', 'за', 'и', 'из', 'или', 'им', 'их', 'к',
+    'как', 'ко', 'ли', 'мы', 'на', 'над', 'не', 'нет', 'ни', 'но', 'о',
+    'об', 'он', 'она', 'они', 'оно', 'от', 'по', 'под', 'при', 'с', 'со',
+    'так', 'то', 'ты', 'у', 'уже', 'что', 'это', 'я',
+    'a', 'an', 'and', 'in', 'is', 'of', 'on', 'or', 'the', 'to',
+))
+
+
+def terms(text, stemmers):
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return Counter(
+        stemmers['english' if word.isascii() else 'russian'].stemWord(
+            word
+        )[:MAX_TERM_LENGTH]
+        for word in words
+        if len(word) > 1 and word not in STOP_WORDS
+    )
+
+
+def index_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    stemmers = {
+        language: snowballstemmer.stemmer(language)
+        for language in ('english', 'russian')
+    }
+    entries = (
+        SearchTerm(post_id=pk, term=term, weight=min(count, MAX_OCCURRENCES))
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+        for term, count in terms(text, stemmers).items()
+    )
+    SearchTerm.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(index_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+"""Кэш целых страниц для анонимных читателей.
+
+Страница хранится вместе с версиями лент (posts.caching), прочитанными
+при её рендере. Сигналы моделей повышают версии затронутых лент, и
+страница, зависящая от них, перестаёт совпадать и рендерится заново;
+остальные страницы остаются в кэше. Страницы, прочитанные с реплики,
+не сохраняются: реплика могла ещё не догнать изменение, которое уже
+повысило версию, и старая страница легла бы в кэш под новой версией.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.replicas import replica_used
+
+from .caching import CACHE_ALIAS, VERSION_KEY, collect_dependencies
+
+PAGE_KEY = 'page:{}'
+
+
+def page_key(request):
+    path = request.get_full_path().encode()
+    return PAGE_KEY.format(hashlib.md5(path).hexdigest())
+
+
+def _cacheable(request):
+    return (
+        settings.PAGE_CACHE_ENABLED
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def _is_fresh(cache, versions):
+    keys = {VERSION_KEY.format(scope): version
+            for scope, version in versions.items()}
+    return cache.get_many(list(keys)) == keys
+
+
+def _should_store(request, response, versions):
+    return (
+        versions
+        and response.status_code == 200
+        and not response.streaming
+        # Страница с CSRF-токеном или своими cookie — только для
+        # этого посетителя.
+        and not request.META.get('CSRF_COOKIE_USED')
+        and not response.cookies
+        and not replica_used()
+    )
+
+
+def cache_anonymous_page(view):
+    """Отдаёт анонимным читателям страницу из кэша, пока её ленты не
+    изменились."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view(request, *args, **kwargs)
+        cache = caches[CACHE_ALIAS]
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None and _is_fresh(cache, cached[0]):
+            return cached[1]
+        with collect_dependencies() as versions:
+            response = view(request, *args, **kwargs)
+        if _should_store(request, response, versions):
+            cache.set(
+                key, (versions, response), settings.PAGE_CACHE_TIMEOUT
+            )
+        return response
+    return wrapper
@@ -0,0 +1,125 @@
+"""Полнотекстовый поиск по постам на обратном индексе.
+
+Слова текста приводятся к основе стеммером Snowball (русским, а для
+латиницы — английским) и хранятся в SearchTerm с числом вхождений.
+Каждое совпавшее слово запроса даёт посту MATCH_WEIGHT очков плюс число
+его вхождений; при равном счёте выше более свежие посты.
+"""
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import snowballstemmer
+from django.db.models import (
+    Count, ExpressionWrapper, IntegerField, Sum, Value
+)
+
+from .models import SearchTerm
+
+MATCH_WEIGHT = 100
+MAX_OCCURRENCES = MATCH_WEIGHT - 1
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+BATCH_SIZE = 500
+# Словарь живого текста невелик, поэтому основы слов кэшируются.
+STEM_CACHE_SIZE = 100000
+WORD_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'все', 'да', 'для', 'до', 'его',
+    'ее', 'если', 'есть', 'же', 'за', 'и', 'из', 'или', 'им', 'их', 'к',
+    'как', 'ко', 'ли', 'мы', 'на', 'над', 'не', 'нет', 'ни', 'но', 'о',
+    'об', 'он', 'она', 'они', 'оно', 'от', 'по', 'под', 'при', 'с', 'со',
+    'так', 'то', 'ты', 'у', 'уже', 'что', 'это', 'я',
+    'a', 'an', 'and', 'in', 'is', 'of', 'on', 'or', 'the', 'to',
+))
+
+# Стеммеры Snowball хранят состояние, поэтому у каждого потока свои.
+_stemmers = threading.local()
+
+
+def _stemmer(language):
+    stemmer = getattr(_stemmers, language, None)
+    if stemmer is None:
+        stemmer = snowballstemmer.stemmer(language)
+        setattr(_stemmers, language, stemmer)
+    return stemmer
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    language = 'english' if word.isascii() else 'russian'
+    return _stemmer(language).stemWord(word)[:MAX_TERM_LENGTH]
+
+
+def terms(text):
+    """Основы слов текста с числом вхождений."""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return Counter(
+        stem(word) for word in words
+        if len(word) > 1 and word not in STOP_WORDS
+    )
+
+
+def query_terms(query):
+    return list(terms(query))[:MAX_QUERY_TERMS]
+
+
+def index_post(post):
+    """Обновляет слова поста в индексе, трогая только изменившиеся."""
+    new = {
+        term: min(count, MAX_OCCURRENCES)
+        for term, count in terms(post.text).items()
+    }
+    old = dict(
+        SearchTerm.objects.filter(post=post).values_list('term', 'weight')
+    )
+    stale = [term for term, weight in old.items() if new.get(term) != weight]
+    if stale:
+        SearchTerm.objects.filter(post=post, term__in=stale).delete()
+    SearchTerm.objects.bulk_create(
+        [
+            SearchTerm(post=post, term=term, weight=weight)
+            for term, weight in new.items() if old.get(term) != weight
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def bulk_index(posts, batch_size=BATCH_SIZE):
+    """Индексирует новые посты, вставленные bulk_create в обход сигналов."""
+    SearchTerm.objects.bulk_create(
+        (
+            SearchTerm(
+                post_id=post.pk,
+                term=term,
+                weight=min(count, MAX_OCCURRENCES),
+            )
+            for post in posts
+            for term, count in terms(post.text).items()
+        ),
+        batch_size=batch_size,
+    )
+
+
+def matching(queryset, query):
+    """Посты из queryset, в которых есть хотя бы одно слово запроса."""
+    return queryset.filter(pk__in=SearchTerm.objects.filter(
+        term__in=query_terms(query)
+    ).values('post_id'))
+
+
+def search_posts(queryset, query):
+    """Найденные посты с релевантностью в поле rank."""
+    words = query_terms(query)
+    if not words:
+        return queryset.none().annotate(
+            rank=Value(0, output_field=IntegerField())
+        )
+    return queryset.filter(search_terms__term__in=words).annotate(
+        rank=ExpressionWrapper(
+            Count('search_terms') * MATCH_WEIGHT
+            + Sum('search_terms__weight'),
+            output_field=IntegerField(),
+        )
+    )
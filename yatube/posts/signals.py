@@ -0,0 +1,156 @@
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import counters, search, thumbnails, timelines
+from .caching import bump_feed_version, post_scopes
+from .models import Comment, Follow, Group, Post
+
+# Посты, которые сейчас удаляются. Их комментарии удаляются каскадом,
+# и ленты поста сбросятся один раз вместе с ним, а не на каждый
+# комментарий.
+_deleting_posts = ContextVar('deleting_posts', default=frozenset())
+
+
+def _cascaded(comment):
+    return comment.post_id in _deleting_posts.get()
+
+
+@receiver(pre_delete, sender=Post)
+def mark_post_deleting(sender, instance, **kwargs):
+    _deleting_posts.set(_deleting_posts.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Post)
+def unmark_post_deleting(sender, instance, **kwargs):
+    # Комментарии удаляются раньше поста: их сигналы уже отработали.
+    _deleting_posts.set(_deleting_posts.get() - {instance.pk})
+
+
+@receiver(post_init, sender=Post)
+def remember_post_relations(sender, instance, **kwargs):
+    instance._initial_group_id = instance.__dict__.get('group_id')
+    instance._initial_author_id = instance.__dict__.get('author_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    scopes = post_scopes(
+        instance.author_id, instance.group_id, instance.pk
+    )
+    if instance._initial_group_id is not None:
+        scopes.append(f'group:{instance._initial_group_id}')
+    bump_feed_version(*scopes)
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    if _cascaded(instance):
+        return
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        bump_feed_version(*post_scopes(
+            post['author_id'], post['group_id'], instance.post_id
+        ))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    authors = Post.objects.filter(group_id=instance.pk).values_list(
+        'author_id', flat=True
+    ).distinct()
+    bump_feed_version(
+        'index', f'group:{instance.pk}',
+        *(f'profile:{author_id}' for author_id in authors)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    bump_feed_version(f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    initial = instance._initial_author_id
+    if created:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+    elif initial is not None and initial != instance.author_id:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+        counters.change_user_counter(initial, 'posts_count', -1)
+    instance._initial_author_id = instance.author_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if _cascaded(instance):
+        return
+    counters.change_comments_count(instance.post_id, -1)
+
+
+def count_follow(follow, delta):
+    counters.change_user_counter(follow.author_id, 'followers_count', delta)
+    counters.change_user_counter(follow.user_id, 'following_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        count_follow(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    count_follow(instance, -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created and timelines.timelines_enabled():
+        timelines.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and timelines.timelines_enabled():
+        timelines.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if timelines.timelines_enabled():
+        timelines.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnail(sender, instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(lambda: thumbnails.schedule(instance.image))
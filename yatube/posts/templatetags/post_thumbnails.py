@@ -0,0 +1,18 @@
+from django import template
+
+from posts.thumbnails import cached_thumbnail, resolve_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def resolve_post_thumbnails(posts):
+    resolve_thumbnails(posts)
+    return ''
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    if hasattr(post, 'thumbnail'):
+        return post.thumbnail
+    return cached_thumbnail(post.image)
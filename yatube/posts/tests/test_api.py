@@ -0,0 +1,121 @@
+from datetime import datetime
+
+from django.core.cache import caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+from posts.utilits import CursorPaginator
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовое название группы',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=str(i))
+            for i in range(15)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feeds(self):
+        urls = {
+            reverse('posts:api_index'): self.guest_client,
+            reverse('posts:api_group_list', kwargs={'slug': 'test-slug'}):
+                self.guest_client,
+            reverse('posts:api_profile', kwargs={'username': 'test_user'}):
+                self.guest_client,
+            reverse('posts:api_follow_index'): self.authorized_client,
+        }
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                first = client.get(url).json()
+                second = client.get(url, {'after': first['next']}).json()
+                self.assertEqual(
+                    [post['id'] for post in first['posts'] + second['posts']],
+                    expected,
+                )
+                self.assertEqual(first['posts'][0]['author'], 'test_user')
+                self.assertEqual(first['posts'][0]['group'], 'test-slug')
+                self.assertIsNone(second['next'])
+
+    def test_not_modified_without_posts_query(self):
+        url = reverse('posts:api_index')
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        cached = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+        page = self.guest_client.get(
+            url, {'after': response.json()['next']},
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(page.status_code, 200)
+
+    def test_new_post_changes_etag(self):
+        url = reverse('posts:api_profile', kwargs={'username': 'test_user'})
+        etag = self.guest_client.get(url)['ETag']
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['posts'][0]['id'], post.pk)
+
+    def test_stale_cursor_returns_page(self):
+        url = reverse('posts:api_index')
+        for year, direction in ((2000, 'after'), (2100, 'before')):
+            with self.subTest(direction=direction):
+                cursor = CursorPaginator(Post.objects.all(), 10).encode_cursor(
+                    {'pub_date': datetime(year, 1, 1), 'id': 10 ** 6}, 1
+                )
+                response = self.guest_client.get(url, {direction: cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.json()['posts'])
+
+    def test_post_detail(self):
+        post = Post.objects.create(author=self.user, text='Пост')
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        response = self.guest_client.get(url)
+        self.assertEqual(response.json()['text'], 'Пост')
+        post.comments.create(author=self.reader, text='Комментарий')
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['comments_count'], 1)
+        post.delete()
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    def test_post_not_modified_without_posts_query(self):
+        post = Post.objects.create(author=self.user, text='Пост')
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_post_creates_no_cache_keys(self):
+        url = reverse('posts:api_post_detail', kwargs={'post_id': 10 ** 6})
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+        self.assertIsNone(caches['shared'].get(f'feed:version:post:{10 ** 6}'))
+        self.assertIsNone(
+            caches['shared'].get(f'feed:modified:post:{10 ** 6}')
+        )
+
+    def test_follow_requires_login(self):
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+
+from posts import cards
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTests(TestCase):
+    """Карточки постов рендерятся один раз на версию поста."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(author=cls.author, group=cls.group, text='Первый')
+        Post.objects.create(author=cls.author, text='Второй')
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def render(self):
+        """HTML ленты и число отрендеренных карточек."""
+        template = cards.get_template(cards.TEMPLATE)
+        with mock.patch.object(cards, 'get_template', return_value=template):
+            with mock.patch.object(
+                template, 'render', wraps=template.render
+            ) as render:
+                html = ''.join(cards.render_cards(Post.objects.feed()))
+        return html, render.call_count
+
+    def test_cards_are_rendered_once(self):
+        html, rendered = self.render()
+        self.assertEqual(rendered, 2)
+        self.assertEqual(html.count('<article>'), 2)
+        self.assertIn('Лев Толстой', html)
+        self.assertIn('все записи группы', html)
+        self.assertEqual(self.render(), (html, 0))
+
+    def test_new_post_renders_only_its_card(self):
+        self.render()
+        Post.objects.create(author=self.author, text='Третий')
+        html, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('Третий', html)
+
+    def test_edited_post_is_rendered_again(self):
+        self.render()
+        post = Post.objects.get(text='Второй')
+        post.text = 'Исправленный'
+        post.save()
+        html, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('Исправленный', html)
+        self.assertNotIn('Второй', html)
+
+    def test_renamed_author_is_rendered_again(self):
+        self.render()
+        User.objects.filter(pk=self.author.pk).update(first_name='Алексей')
+        html, rendered = self.render()
+        self.assertEqual(rendered, 2)
+        self.assertIn('Алексей Толстой', html)
+
+    def test_cards_without_images_skip_thumbnails(self):
+        with mock.patch.object(cards, 'resolve_thumbnails') as resolve:
+            html = cards.render_cards(Post.objects.feed(), images=False)
+        resolve.assert_not_called()
+        self.assertEqual(len(html), 2)
@@ -0,0 +1,335 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts import benchmarks
+from posts.caching import VERSION_KEY
+from posts.importer import Importer
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserCounters
+)
+
+
+@override_settings(FOLLOW_TIMELINE_ENABLED=True)
+class RebuildTimelinesCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.author = User.objects.create_user(username='test_author')
+        Post.objects.bulk_create(
+            Post(text=str(i), author=cls.author) for i in range(3)
+        )
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.author)
+        ])
+
+    def test_rebuild_timelines(self):
+        """Команда восстанавливает ленты, созданные в обход сигналов."""
+        self.assertFalse(TimelineEntry.objects.exists())
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertCountEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post_id', flat=True)),
+            list(Post.objects.values_list('pk', flat=True)),
+        )
+
+
+class ReconcileCountersCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.author = User.objects.create_user(username='test_author')
+        Post.objects.bulk_create(
+            Post(text=str(i), author=cls.author) for i in range(3)
+        )
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=str(i))
+            for i in range(2)
+        )
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.author)
+        ])
+
+    def test_reconcile_counters(self):
+        """Команда исправляет счётчики, разошедшиеся с данными."""
+        call_command('reconcile_counters', stdout=StringIO())
+        author = UserCounters.objects.get(user=self.author)
+        reader = UserCounters.objects.get(user=self.reader)
+        self.post.refresh_from_db()
+        self.assertEqual(author.posts_count, 4)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(reader.following_count, 1)
+        self.assertEqual(self.post.comments_count, 2)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.group = Group.objects.create(
+            title='Тестовое название группы',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(5)
+        ]
+
+    def export(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('export_posts', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_export_ndjson_with_watermark(self):
+        output, log = self.export('posts', '--chunk-size=2')
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(records[0]['author'], 'test_author')
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertIn(f'--after-id={self.posts[-1].pk}', log)
+        middle = self.posts[2]
+        output, log = self.export(
+            'posts', f'--since={middle.pub_date.isoformat()}',
+            f'--after-id={middle.pk}')
+        self.assertEqual(
+            [json.loads(line)['id'] for line in output.splitlines()],
+            [post.pk for post in self.posts[3:]],
+        )
+
+    def test_export_csv(self):
+        output, log = self.export('groups', '--format=csv')
+        header, row = csv.reader(StringIO(output))
+        self.assertEqual(header, ['id', 'title', 'slug', 'description'])
+        self.assertEqual(row[2], 'test-slug')
+
+    def test_export_endpoint_is_staff_only(self):
+        url = reverse('posts:export')
+        client = Client()
+        client.force_login(self.author)
+        self.assertEqual(client.get(url).status_code, 302)
+        staff = User.objects.create_user(
+            username='test_staff', is_staff=True)
+        client.force_login(staff)
+        response = client.get(url, {'model': 'posts', 'after_id': 0})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(
+            client.get(url, {'model': 'users'}).status_code, 400)
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовое название группы',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'Котик {i}', author=cls.author, group=cls.group)
+        Comment.objects.create(post=post, author=cls.reader, text='Ура')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.ndjson')
+        with open(self.path, 'w', encoding='utf-8') as dump:
+            call_command('export_posts', 'all', stdout=dump, stderr=StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def import_dump(self, *args):
+        call_command(
+            'import_yatube', self.path, '--batch-size=2', *args,
+            stdout=StringIO(), stderr=StringIO())
+
+    def test_import_round_trip(self):
+        posts = list(Post.objects.values_list(
+            'pk', 'text', 'pub_date', 'author__username', 'group__slug'))
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(username='test_author').delete()
+        self.import_dump()
+        self.assertEqual(
+            list(Post.objects.values_list(
+                'pk', 'text', 'pub_date', 'author__username', 'group__slug')),
+            posts,
+        )
+        self.assertEqual(Comment.objects.get().text, 'Ура')
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author__username='test_author').exists())
+        author = User.objects.get(username='test_author')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(author.counters.posts_count, 3)
+        self.assertEqual(Post.objects.first().comments_count, 1)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:search'), {'q': 'котики'}
+            ).context['page_obj'].paginator.count,
+            3,
+        )
+
+    def test_import_resumes_and_skips_existing(self):
+        last = Post.objects.order_by('pk').last()
+        Post.objects.filter(pk=last.pk).delete()
+        with open(f'{self.path}.checkpoint', 'w') as checkpoint:
+            checkpoint.write('3')
+        self.import_dump()
+        self.assertTrue(Post.objects.filter(pk=last.pk).exists())
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_import_recounts_only_touched_rows(self):
+        other = User.objects.create_user(username='test_other')
+        UserCounters.objects.update_or_create(
+            user=other, defaults={'posts_count': 7})
+        Post.objects.order_by('pk').last().delete()
+        self.import_dump()
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 3)
+        self.assertEqual(UserCounters.objects.get(user=other).posts_count, 7)
+
+    def test_resumed_import_refreshes_rows_before_crash(self):
+        Post.objects.all().delete()
+        User.objects.filter(username='test_author').delete()
+        caches['shared'].clear()
+        flush = Importer.flush
+        calls = []
+
+        def crash_on_last_batch(importer, chunk):
+            calls.append(chunk)
+            if len(calls) == 3:
+                raise RuntimeError('сбой')
+            flush(importer, chunk)
+
+        with mock.patch.object(Importer, 'flush', crash_on_last_batch):
+            with self.assertRaises(RuntimeError):
+                self.import_dump()
+        author = User.objects.get(username='test_author')
+        version = VERSION_KEY.format(f'profile:{author.pk}')
+        self.assertIsNone(caches['shared'].get(version))
+        self.import_dump()
+        self.assertIsNotNone(caches['shared'].get(version))
+        self.assertEqual(author.counters.posts_count, 3)
+
+    def test_reimport_reports_nothing_imported(self):
+        stdout = StringIO()
+        call_command(
+            'import_yatube', self.path, stdout=stdout, stderr=StringIO())
+        # Группа, три поста, комментарий и подписка уже есть в базе.
+        self.assertIn('Импортировано: 0, ', stdout.getvalue())
+        self.assertIn('существующие: 6', stdout.getvalue())
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_import_rejects_invalid_rows(self):
+        with open(self.path, 'w', encoding='utf-8') as dump:
+            dump.write(
+                '{"model": "posts", "id": 100, "text": "", '
+                '"author": "test_author"}\n'
+                'не json\n'
+                '{"model": "posts", "id": 101, "text": "Пост", '
+                '"author": "test_author", "group": "нет-такой"}\n'
+                '{"model": "posts", "id": 102, "text": "Пост", '
+                '"author": "test_author"}\n'
+            )
+        stderr = StringIO()
+        call_command(
+            'import_yatube', self.path, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(
+            list(Post.objects.filter(pk__gte=100).values_list(
+                'pk', flat=True)),
+            [102],
+        )
+        self.assertEqual(len(stderr.getvalue().splitlines()), 3)
+
+
+class GenerateDataAndLoadTestCommandsTest(TestCase):
+    def test_generate_and_load_test(self):
+        call_command(
+            'generate_data', '--users=30', '--groups=3', '--posts=200',
+            '--comments=100', '--follows=150', '--seed=1', '--batch-size=64',
+            stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 150)
+        top = UserCounters.objects.order_by('-posts_count').first()
+        self.assertGreater(top.posts_count, 200 / 30)
+        self.assertEqual(
+            sum(UserCounters.objects.values_list('posts_count', flat=True)),
+            200,
+        )
+        stdout = StringIO()
+        call_command('load_test', '--requests=3', stdout=stdout)
+        report = stdout.getvalue()
+        for page in ('index', 'profile', 'follow_index', 'post_detail'):
+            with self.subTest(page=page):
+                self.assertIn(page, report)
+        self.assertNotIn('500', report)
+
+
+class BenchmarkTest(TestCase):
+    def test_every_case_runs(self):
+        tiny = dict(users=5, groups=1, posts=30, comments=30, follows=5)
+        with mock.patch.dict(benchmarks.SIZES, tiny=tiny):
+            report = benchmarks.run('tiny', repeat=1, warmup=0)
+        self.assertIn('views.index', report['results'])
+        self.assertIn('thumbnails.generate', report['results'])
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertGreater(result['calibration_ms'], 0)
+
+
+class BenchmarkCompareTest(SimpleTestCase):
+    def report(self, time_ms, queries=2, calibration_ms=10):
+        return {'size': 'small', 'results': {'views.index': {
+            'time_ms': time_ms, 'queries': queries,
+            'calibration_ms': calibration_ms,
+        }}}
+
+    def test_query_growth_is_regression(self):
+        regressions = benchmarks.compare(
+            self.report(10, queries=3), self.report(10)
+        )
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('SQL', regressions[0])
+
+    def test_time_is_normalized_by_calibration(self):
+        baseline = self.report(10)
+        self.assertEqual(benchmarks.compare(
+            self.report(20, calibration_ms=20), baseline
+        ), [])
+        self.assertEqual(len(benchmarks.compare(
+            self.report(20), baseline
+        )), 1)
+
+    def test_other_size_is_rejected(self):
+        with self.assertRaises(ValueError):
+            benchmarks.compare(
+                self.report(10), {**self.report(10), 'size': 'large'}
+            )
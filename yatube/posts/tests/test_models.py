@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
 from django.test import TestCase
 
-from posts.models import Group, Post
+from posts.models import Follow, Group, Post
+from posts.utilits import CursorPaginator
 
 User = get_user_model()
 
@@ -36,3 +38,47 @@ class PostModelTest(TestCase):
                     str(field),
                     expected_value
                 )
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент используют составные индексы (план SQLite)."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group)
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_listing_queries_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Планы запросов проверяются только на SQLite')
+        feed = CursorPaginator(Post.objects.feed(), 10).object_list
+        queries = {
+            'post_pub_date_idx': feed[:11],
+            'post_author_pub_date_idx': feed.filter(author=self.user)[:11],
+            'post_group_pub_date_idx': feed.filter(group=self.group)[:11],
+            'comment_post_created_idx': self.post.comments.all()[:11],
+            'sqlite_autoindex_posts_follow': Follow.objects.filter(
+                user=self.user, author=self.user),
+        }
+        for index, queryset in queries.items():
+            with self.subTest(index=index):
+                plan = self.plan(queryset)
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_follow_is_unique(self):
+        Follow.objects.create(user=self.user, author=self.user)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=self.user)
@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTests(TestCase):
+    """Страницы для анонимов берутся из кэша и сбрасываются сигналами."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=['group']),
+            'profile': reverse('posts:profile', args=['author']),
+            'post': reverse('posts:post_detail', args=[cls.post.pk]),
+            'other': reverse('posts:profile', args=['other']),
+        }
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.guest = Client()
+        for url in self.urls.values():
+            self.guest.get(url)
+
+    def cached(self):
+        """Какие страницы отдаются из кэша: без SQL-запросов."""
+        result = set()
+        for name, url in self.urls.items():
+            with CaptureQueriesContext(connection) as queries:
+                self.guest.get(url)
+            if not queries:
+                result.add(name)
+        return result
+
+    def test_pages_are_cached_for_anonymous(self):
+        self.assertEqual(self.cached(), set(self.urls))
+
+    def test_query_string_is_part_of_key(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.guest.get(self.urls['index'], {'page': 2})
+        self.assertTrue(queries)
+
+    def test_authenticated_user_bypasses_cache(self):
+        client = Client()
+        client.force_login(self.other)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.urls['index'])
+        self.assertTrue(queries)
+        self.assertContains(response, 'Пользователь: other')
+
+    def test_new_post_purges_its_feeds_only(self):
+        Post.objects.create(author=self.other, text='Новый')
+        self.assertEqual(self.cached(), {'group', 'profile', 'post'})
+
+    def test_comment_purges_post_page(self):
+        Comment.objects.create(
+            post=self.post, author=self.other, text='Комментарий'
+        )
+        self.assertEqual(self.cached(), {'other'})
+        self.assertContains(self.guest.get(self.urls['post']), 'Комментарий')
+
+    def test_group_change_purges_group_pages(self):
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(self.cached(), {'other'})
+        self.assertContains(
+            self.guest.get(self.urls['post']), 'Новое название'
+        )
+
+    def test_follow_keeps_anonymous_pages(self):
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertEqual(self.cached(), set(self.urls))
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheCommitTests(TransactionTestCase):
+    """Страница, сохранённая до коммита записи, сбрасывается коммитом."""
+    def setUp(self):
+        caches['shared'].clear()
+        self.author = User.objects.create_user(username='author')
+        self.guest = Client()
+
+    def test_page_rendered_inside_write_transaction_is_purged(self):
+        url = reverse('posts:index')
+        with transaction.atomic():
+            Post.objects.create(author=self.author, text='Пост')
+            # Версия уже повышена, а коммита ещё не было: так страницу
+            # сохранил бы читатель, рендеривший её по старым данным.
+            self.guest.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.guest.get(url)
+        self.assertTrue(queries)
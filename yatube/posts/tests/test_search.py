@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, SearchTerm, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.old = Post.objects.create(
+            text='Котики спят на диване', author=cls.user)
+        cls.both = Post.objects.create(
+            text='Котик и собака дружат', author=cls.user)
+        cls.new = Post.objects.create(
+            text='Новый котик в доме', author=cls.user)
+        Post.objects.create(text='Про погоду', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return list(response.context.get('page_obj'))
+
+    def test_search_uses_stemming(self):
+        """Слово находится в любой форме."""
+        self.assertEqual(
+            self.search('котиков'), [self.new, self.both, self.old])
+
+    def test_search_ranks_by_relevance_then_recency(self):
+        self.assertEqual(
+            self.search('котик собаки'), [self.both, self.new, self.old])
+
+    def test_search_index_follows_edits(self):
+        post = Post.objects.get(pk=self.new.pk)
+        post.text = 'Новая собака в доме'
+        post.save()
+        self.assertEqual(self.search('котик'), [self.both, self.old])
+        self.assertEqual(self.search('собака'), [post, self.both])
+        post.delete()
+        self.assertFalse(SearchTerm.objects.filter(post_id=post.pk).exists())
+
+    def test_search_pages_by_cursor(self):
+        Post.objects.bulk_create(
+            Post(text='котик', author=self.user) for _ in range(10))
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'котик'})
+        first = response.context.get('page_obj')
+        second = self.search('котик', after=first.next_cursor)
+        self.assertEqual(len(first) + len(second), 13)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(second[-1], self.old)
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('и на'), [])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='test_admin', email='admin@example.com',
+            password='test_password')
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаками'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.both])
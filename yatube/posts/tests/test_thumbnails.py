@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_PREGENERATE_ASYNC=True
+)
+class ThumbnailPipelineTests(TestCase):
+    """Миниатюры создаются вне запроса, шаблон видит заглушку."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+
+    def test_pending_thumbnail_is_placeholder(self):
+        with mock.patch.object(thumbnails, '_get_executor') as executor:
+            thumbnail = thumbnails.cached_thumbnail(self.post.image)
+        self.assertIsInstance(thumbnail, thumbnails.Placeholder)
+        executor.return_value.submit.assert_called_once()
+
+    def test_generated_thumbnail_is_read_without_rendering(self):
+        thumbnails.generate(self.post.image.name)
+        with mock.patch.object(thumbnails, 'get_thumbnail') as render:
+            thumbnail = thumbnails.cached_thumbnail(self.post.image)
+        render.assert_not_called()
+        self.assertNotIsInstance(thumbnail, thumbnails.Placeholder)
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+    def test_post_without_image_has_no_thumbnail(self):
+        post = Post.objects.create(text='Без картинки', author=self.user)
+        self.assertIsNone(thumbnails.cached_thumbnail(post.image))
+
+    def test_page_thumbnails_are_resolved_in_one_batch(self):
+        posts = [self.post] + [
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=self.user,
+                image=SimpleUploadedFile(
+                    name=f'thumb{i}.gif', content=SMALL_GIF,
+                    content_type='image/gif'),
+            )
+            for i in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        caches['shared'].clear()
+        with self.assertNumQueries(1):
+            thumbnails.resolve_thumbnails(posts)
+        self.assertTrue(all(
+            post.thumbnail.url.startswith(settings.MEDIA_URL)
+            for post in posts
+        ))
+        with self.assertNumQueries(0):
+            thumbnails.resolve_thumbnails(posts)
@@ -1,7 +1,13 @@
+from datetime import datetime
+
+from django.core.cache import caches
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Group, Post, User
+from posts.utilits import CursorPaginator
 
 FIRST_PAGE = 10
 SECOND_PAGE = 5
@@ -23,6 +29,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(posts)
 
     def setUp(self):
+        caches['shared'].clear()
         self.guest_client = Client()
 
     def test_paginator(self):
@@ -46,3 +53,97 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(reverse=reverse):
                 self.assertEqual(len(self.guest_client.get(
                     reverse_page).context.get('page_obj')), len_posts)
+
+    def test_cursor_navigation(self):
+        """Курсоры ?after=/?before= листают ленту без пропусков."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context.get('page_obj')
+        second = self.guest_client.get(
+            url, {'after': first.next_cursor}).context.get('page_obj')
+        self.assertEqual(len(second), SECOND_PAGE)
+        self.assertEqual(second.number, 2)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            list(first) + list(second),
+            list(Post.objects.order_by('-pub_date', '-pk'))
+        )
+        back = self.guest_client.get(
+            url, {'before': second.previous_cursor}).context.get('page_obj')
+        self.assertEqual(list(back), list(first))
+        self.assertEqual(back.number, 1)
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'не-курсор'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context.get('page_obj').number, 1)
+
+    def test_cursor_past_the_data_falls_back(self):
+        """Устаревший курсор не роняет ленту пустой страницей."""
+        url = reverse('posts:index')
+        for year, direction, number in (
+            (2000, 'after', 2), (2100, 'before', 1),
+        ):
+            with self.subTest(direction=direction):
+                cursor = forged_cursor(datetime(year, 1, 1))
+                response = self.guest_client.get(url, {direction: cursor})
+                self.assertEqual(response.status_code, 200)
+                page = response.context.get('page_obj')
+                self.assertEqual(page.number, number)
+                self.assertTrue(page.object_list)
+
+
+def forged_cursor(pub_date):
+    """Курсор на пост с датой pub_date, которого в базе нет."""
+    return CursorPaginator(Post.objects.all(), 10).encode_cursor(
+        {'pub_date': pub_date, 'id': 10 ** 6}, 1
+    )
+
+
+class PageWindowTest(TestCase):
+    """Окно номеров страниц не растёт с числом страниц."""
+    def window(self, number, num_pages):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        paginator.count = num_pages * 10
+        return list(paginator.get_elided_page_range(number))
+
+    def test_short_range_is_not_elided(self):
+        self.assertEqual(self.window(3, 6), [1, 2, 3, 4, 5, 6])
+
+    def test_window_around_current_page(self):
+        ellipsis = CursorPaginator.ELLIPSIS
+        self.assertEqual(
+            self.window(500, 10000),
+            [1, ellipsis, 498, 499, 500, 501, 502, ellipsis, 10000],
+        )
+        self.assertEqual(
+            self.window(1, 10000), [1, 2, 3, ellipsis, 10000]
+        )
+        self.assertEqual(
+            self.window(10000, 10000), [1, ellipsis, 9998, 9999, 10000]
+        )
+
+    def test_page_html_and_count_query_stay_constant(self):
+        user = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=user, text=str(i)) for i in range(300)
+        )
+        caches['shared'].clear()
+        client = Client()
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as first:
+            client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            response = client.get(url, {'page': 15})
+        counts = [
+            query for query in first.captured_queries + second.captured_queries
+            if 'COUNT' in query['sql']
+        ]
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(
+            response.context['page_obj'].page_window,
+            [1, CursorPaginator.ELLIPSIS, 13, 14, 15, 16, 17,
+             CursorPaginator.ELLIPSIS, 30],
+        )
+        self.assertEqual(response.content.decode().count('page-item'), 13)
@@ -1,16 +1,20 @@
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django import forms
-from django.core.cache import cache
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Group, Post, Comment
+from posts.models import Group, Post, Comment, Follow, TimelineEntry
+from posts.counters import get_counters
 from posts.forms import PostForm
 
 User = get_user_model()
 
 
+@override_settings(THUMBNAIL_PREGENERATE_ASYNC=False)
 class PostsPagesTests(TestCase):
     """ Тест страниц сайта."""
     @classmethod
@@ -46,6 +50,7 @@ class PostsPagesTests(TestCase):
         )
 
     def setUp(self):
+        caches['shared'].clear()
         # self.user2 = User.objects.create_user(username='test_comment_user')
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -177,15 +182,241 @@ class PostsPagesTests(TestCase):
         self.assertEqual(group2, PostsPagesTests.group2)
 
     def test_index_cache(self):
+        """Страница ленты кэшируется и сбрасывается при изменении постов."""
         new_post = Post.objects.create(
             text='Тестовый текст2',
             author=PostsPagesTests.user,
             group=PostsPagesTests.group,
         )
         content1 = self.authorized_client.get(reverse('posts:index')).content
-        new_post.delete()
+        Post.objects.filter(pk=new_post.pk).update(text='Без сигналов')
         content2 = self.authorized_client.get(reverse('posts:index')).content
         self.assertEqual(content1, content2)
-        cache.clear()
+        new_post.delete()
         content3 = self.authorized_client.get(reverse('posts:index')).content
         self.assertNotEqual(content1, content3)
+        self.assertNotIn('Тестовый текст2', content3.decode())
+
+    def test_index_cache_is_page_aware(self):
+        """Разные страницы ленты не делят один фрагмент кэша."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(10)
+        )
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(
+            reverse('posts:index'),
+            {'after': first.context.get('page_obj').next_cursor}
+        )
+        self.assertIn(self.post.text, second.content.decode())
+        self.assertNotIn(self.post.text, first.content.decode())
+
+
+class FeedQueryBudgetTests(TestCase):
+    """Число запросов на страницу ленты не зависит от числа постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_reader')
+        cls.authors = [
+            User.objects.create_user(username=f'test_author{i}')
+            for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовое название группы',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.authors[i % 3], group=cls.group, text=str(i))
+            for i in range(45)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, author=author) for author in cls.authors
+        )
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_query_budget(self):
+        budgets = {
+            reverse('posts:index'): (self.guest_client, 2),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}):
+                (self.guest_client, 3),
+            reverse('posts:profile', kwargs={'username': 'test_author0'}):
+                (self.guest_client, 4),
+            reverse('posts:follow_index'): (self.authorized_client, 4),
+        }
+        for url, (client, budget) in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    response = client.get(url)
+                self.assertEqual(len(response.context.get('page_obj')), 10)
+
+
+@override_settings(FOLLOW_TIMELINE_ENABLED=True)
+class FollowTimelineTests(TestCase):
+    """Лента подписок, собранная при записи."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.author = User.objects.create_user(username='test_author')
+        cls.stranger = User.objects.create_user(username='test_stranger')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_page(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context.get('page_obj'))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'test_author'}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.follow_page(), [self.old_post])
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'test_author'}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.follow_page(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.stranger)
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    @override_settings(FOLLOW_TIMELINE_SIZE=2)
+    def test_timeline_is_capped(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_at_request_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+
+class CountersTests(TestCase):
+    """Счётчики обновляются в представлениях записи."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_counters(self):
+        url = reverse(
+            'posts:profile_follow', kwargs={'username': 'test_author'})
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(get_counters(self.author.pk).followers_count, 1)
+        self.assertEqual(get_counters(self.reader.pk).following_count, 1)
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'test_author'}))
+        self.assertEqual(get_counters(self.author.pk).followers_count, 0)
+
+    def test_comment_and_post_counters(self):
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(get_counters(self.author.pk).posts_count, 1)
+        self.post.delete()
+        self.assertEqual(get_counters(self.author.pk).posts_count, 0)
+
+    def test_post_delete_cost_does_not_grow_with_comments(self):
+        queries = []
+        for count in (1, 20):
+            post = Post.objects.create(text='Пост', author=self.author)
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.reader, text=str(i))
+                for i in range(count)
+            )
+            with CaptureQueriesContext(connection) as captured:
+                post.delete()
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+        # Следующие удаления комментариев снова обновляют счётчики.
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.comments.create(author=self.reader, text='Комментарий')
+        post.comments.get().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+
+class CommentsPaginationTests(TestCase):
+    """Комментарии к посту отдаются страницами."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.commenters = [
+            User.objects.create_user(username=f'test_commenter{i}')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.guest_client = Client()
+
+    def add_comments(self, count):
+        Comment.objects.bulk_create(
+            Comment(
+                post=self.post,
+                author=self.commenters[i % 5],
+                text=f'Комментарий {i}',
+            )
+            for i in range(count)
+        )
+
+    def test_post_detail_query_count_is_fixed(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.add_comments(3)
+        with self.assertNumQueries(3):
+            self.guest_client.get(url)
+        self.add_comments(100)
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(url)
+        self.assertEqual(len(response.context.get('comments')), 20)
+
+    def test_load_more_endpoint(self):
+        self.add_comments(45)
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen, cursor = [], ''
+        while cursor is not None:
+            page = self.guest_client.get(url, {'after': cursor}).json()
+            seen += [comment['id'] for comment in page['comments']]
+            cursor = page['next']
+        self.assertEqual(
+            seen,
+            list(Comment.objects.order_by(
+                '-created', '-pk').values_list('pk', flat=True)),
+        )
+
+    def test_load_more_unknown_post(self):
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
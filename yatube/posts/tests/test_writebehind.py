@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import queue
+from posts import writebehind
+from posts.models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class WriteBehindTests(TestCase):
+    """Отложенная запись комментариев и подписок."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        caches['shared'].clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(
+            WRITE_BEHIND_ENABLED=True,
+            WRITE_BEHIND_QUEUE=f'{directory}/queue.sqlite3',
+            WRITE_BEHIND_FLUSH_INTERVAL=None,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def comment(self, key):
+        return self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий', 'idempotency_key': key},
+        )
+
+    def follow(self, action):
+        self.client.get(reverse(f'posts:{action}', args=['author']))
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_comment_is_written_once_on_flush(self):
+        key = uuid.uuid4()
+        self.comment(key)
+        self.comment(key)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(writebehind.flush(), 1)
+        # Повтор той же формы после записи тоже не дублирует комментарий.
+        self.comment(key)
+        writebehind.flush()
+        self.assertEqual(Comment.objects.count(), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.reader)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_comment_keeps_queued_time(self):
+        sent = datetime(2020, 1, 1, 12, 0)
+        with mock.patch.object(writebehind.timezone, 'now',
+                               return_value=sent):
+            writebehind.add_comment(
+                self.post.pk, self.reader.pk, 'Комментарий', uuid.uuid4()
+            )
+        writebehind.flush()
+        self.assertEqual(Comment.objects.get().created, sent)
+        # Поле модели общее для потоков процесса и остаётся нетронутым.
+        self.assertTrue(Comment._meta.get_field('created').auto_now_add)
+
+    def test_last_follow_action_wins(self):
+        for action in ('profile_follow', 'profile_unfollow',
+                       'profile_follow'):
+            self.follow(action)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(writebehind.flush(), 3)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.follow('profile_unfollow')
+        writebehind.flush()
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+
+    def test_unacknowledged_batch_is_redelivered_once(self):
+        self.comment(uuid.uuid4())
+        self.follow('profile_follow')
+        jobs = writebehind.get_queue().claim(10)
+        # Пачка в работе у другого процесса: вторую не выдают.
+        self.assertEqual(writebehind.flush(), 0)
+        # Процесс записал пачку и упал, не подтвердив её.
+        writebehind.apply_comments(
+            [payload for pk, kind, payload in jobs if kind == 'comment']
+        )
+        writebehind.apply_follows(
+            [(kind, payload) for pk, kind, payload in jobs
+             if kind != 'comment']
+        )
+        with mock.patch.object(queue.time, 'time',
+                               return_value=queue.time.time()
+                               + queue.CLAIM_TIMEOUT + 1):
+            self.assertEqual(writebehind.flush(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_broken_job_goes_to_dead_letters(self):
+        self.comment(uuid.uuid4())
+        # Задача без текста и даты не запишется ни с какой попытки.
+        writebehind.get_queue().put(
+            'comment', {'post': self.post.pk, 'author': self.reader.pk,
+                        'key': str(uuid.uuid4())}
+        )
+        self.follow('profile_follow')
+        for attempt in range(queue.MAX_ATTEMPTS - 1):
+            with self.assertRaises(KeyError):
+                writebehind.flush()
+        # Задачи до сломанной записываются сразу, после — ждут её.
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(Follow.objects.exists())
+        with self.assertLogs('posts.writebehind', 'ERROR'):
+            writebehind.flush()
+        writebehind.flush()
+        self.assertTrue(Follow.objects.exists())
+        dead = writebehind.get_queue().dead()
+        self.assertEqual(len(dead), 1)
+        self.assertIn('KeyError', dead[0][3])
+
+    def test_comment_to_deleted_post_is_dropped(self):
+        post = Post.objects.create(author=self.author, text='Удалят')
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий'},
+        )
+        Post.objects.filter(pk=post.pk).delete()
+        self.assertEqual(writebehind.flush(), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(len(writebehind.get_queue()), 0)
+
+
+class IdempotentCommentTests(TestCase):
+    def test_resubmitted_form_creates_one_comment(self):
+        user = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=user, text='Пост')
+        client = Client()
+        client.force_login(user)
+        key = uuid.uuid4()
+        for _ in range(2):
+            client.post(
+                reverse('posts:add_comment', args=[post.pk]),
+                {'text': 'Комментарий', 'idempotency_key': key},
+            )
+        self.assertEqual(Comment.objects.count(), 1)
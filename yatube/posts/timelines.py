@@ -0,0 +1,142 @@
+"""Ленты подписок, собранные при записи (fan-out-on-write).
+
+При публикации поста его id раскладывается по лентам подписчиков автора,
+поэтому follow_index читает готовый список вместо JOIN Follow и Post.
+Посты авторов, у которых подписчиков больше FOLLOW_TIMELINE_FANOUT_LIMIT,
+не раскладываются, а подмешиваются при чтении.
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+BATCH_SIZE = 500
+
+
+def timelines_enabled():
+    return settings.FOLLOW_TIMELINE_ENABLED
+
+
+def is_fanout_author(author_id):
+    return not UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FOLLOW_TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def pull_authors(user):
+    """Авторы из подписок пользователя, которых читаем напрямую."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers_count__gt=(
+                settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+            ),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def trim(users):
+    """Оставляет в лентах только FOLLOW_TIMELINE_SIZE последних постов."""
+    cutoff = TimelineEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-pub_date').values('pub_date')[
+        settings.FOLLOW_TIMELINE_SIZE - 1:settings.FOLLOW_TIMELINE_SIZE
+    ]
+    TimelineEntry.objects.filter(
+        user_id__in=users, pub_date__lt=Subquery(cutoff)
+    ).delete()
+
+
+def _entries(user_id, posts):
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post['pk'],
+            author_id=post['author_id'],
+            pub_date=post['pub_date'],
+        )
+        for post in posts
+    ]
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.values_list(
+                'user_id', flat=True
+            ).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(followers.values('user_id'))
+
+
+def backfill(user_id, author_id):
+    """Подтягивает последние посты автора в ленту нового подписчика."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values('pk', 'author_id', 'pub_date')[:settings.FOLLOW_TIMELINE_SIZE]
+    TimelineEntry.objects.bulk_create(
+        _entries(user_id, posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user):
+    """Собирает ленту пользователя заново по текущим подпискам."""
+    TimelineEntry.objects.filter(user=user).delete()
+    posts = Post.objects.filter(
+        author__following__user=user
+    ).exclude(
+        author_id__in=pull_authors(user)
+    ).order_by('-pub_date', '-pk').values(
+        'pk', 'author_id', 'pub_date'
+    )[:settings.FOLLOW_TIMELINE_SIZE]
+    TimelineEntry.objects.bulk_create(
+        _entries(user.pk, posts), batch_size=BATCH_SIZE
+    )
+
+
+def timeline_post_ids(user):
+    """Id постов ленты подписок: готовая лента плюс авторы для чтения."""
+    size = settings.FOLLOW_TIMELINE_SIZE
+    rows = list(
+        TimelineEntry.objects.filter(user=user).order_by(
+            '-pub_date', '-post_id'
+        ).values_list('pub_date', 'post_id')[:size]
+    )
+    authors = pull_authors(user)
+    if authors:
+        rows += Post.objects.filter(author_id__in=authors).order_by(
+            '-pub_date', '-pk'
+        ).values_list('pub_date', 'pk')[:size]
+        rows = sorted(rows, reverse=True)[:size]
+    return [post_id for pub_date, post_id in rows]
+
+
+def follow_feed(user):
+    """Посты из подписок пользователя для ленты follow_index."""
+    if timelines_enabled():
+        return Post.objects.feed().filter(pk__in=timeline_post_ids(user))
+    return Post.objects.feed().filter(author__following__user=user)
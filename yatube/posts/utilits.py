@@ -1,11 +1,248 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+from types import SimpleNamespace
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 from django import forms
 
+COUNT_CACHE_ALIAS = 'shared'
+COUNT_CACHE_TIMEOUT = 60 * 60
+# Окно номеров страниц: по сколько вокруг текущей и по краям.
+PAGES_ON_EACH_SIDE = 2
+PAGES_ON_ENDS = 1
+
+
+class CursorPage(Page):
+    """Страница, соседи которой определяются курсором, а не OFFSET."""
+
+    def __init__(self, object_list, number, paginator, has_next,
+                 has_previous):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+    @cached_property
+    def page_window(self):
+        """Номера страниц для навигации, пропуски — paginator.ELLIPSIS."""
+        return list(self.paginator.get_elided_page_range(self.number))
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return ''
+        return self.paginator.encode_cursor(
+            self.object_list[-1], self.number + 1
+        )
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return ''
+        return self.paginator.encode_cursor(
+            self.object_list[0], self.number - 1
+        )
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по убыванию ключей (по умолчанию pub_date, pk).
+
+    Переходы вперёд и назад идут по непрозрачным токенам ?after=/?before=
+    и стоят одинаково на любой глубине. Номер страницы по-прежнему
+    поддерживается через OFFSET, а общее число записей берётся из кэша.
+    Ключом может быть и аннотация запроса, например релевантность поиска.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk'),
+                 count_key=None, count_timeout=COUNT_CACHE_TIMEOUT):
+        self.keys = keys
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+        object_list = object_list.order_by(*('-' + key for key in keys))
+        super().__init__(object_list, per_page)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.object_list.count()
+        return caches[COUNT_CACHE_ALIAS].get_or_set(
+            f'paginator:count:{self.count_key}',
+            self.object_list.count,
+            self.count_timeout,
+        )
+
+    def _field(self, key):
+        annotations = self.object_list.query.annotations
+        if key in annotations:
+            return annotations[key].output_field
+        opts = self.object_list.model._meta
+        return opts.pk if key == 'pk' else opts.get_field(key)
+
+    def _value(self, obj, key):
+        # Страница может состоять и из словарей values().
+        if isinstance(obj, dict):
+            obj = SimpleNamespace(**obj)
+        if key in self.object_list.query.annotations:
+            return getattr(obj, key)
+        field = self._field(key)
+        if key == 'pk' and not hasattr(obj, field.attname):
+            obj = SimpleNamespace(**{field.attname: obj.pk})
+        return field.value_to_string(obj)
+
+    def encode_cursor(self, obj, number):
+        values = [self._value(obj, key) for key in self.keys]
+        raw = json.dumps(values + [number]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            *values, number = json.loads(raw.decode())
+            values = [
+                self._field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidPage('Некорректный курсор')
+        if len(values) != len(self.keys) or not isinstance(number, int):
+            raise InvalidPage('Некорректный курсор')
+        return values, max(number, 1)
+
+    def _seek(self, values, lookup):
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            bounds = dict(zip(self.keys[:position], values[:position]))
+            bounds[f'{key}__{lookup}'] = values[position]
+            condition |= Q(**bounds)
+        return condition
+
+    def _fetch(self, queryset):
+        return list(queryset[:self.per_page + 1])
+
+    def page(self, number):
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        rows = self._fetch(self.object_list[offset:])
+        if not rows and number > 1:
+            if number > self.num_pages:
+                return self.page(self.num_pages)
+            return self.page(1)
+        return CursorPage(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage('Некорректный номер страницы')
+        if number < 1:
+            raise InvalidPage('Некорректный номер страницы')
+        return number
+
+    def get_elided_page_range(self, number=1, on_each_side=PAGES_ON_EACH_SIDE,
+                              on_ends=PAGES_ON_ENDS):
+        """Первые и последние on_ends страниц и on_each_side вокруг number.
+
+        Как Paginator.get_elided_page_range из Django 3.2: число ссылок
+        не зависит от числа страниц.
+        """
+        num_pages = self.num_pages
+        number = min(self.validate_number(number), num_pages)
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except InvalidPage:
+            return self.page(1)
+
+    def page_after(self, token):
+        values, number = self.decode_cursor(token)
+        rows = self._fetch(
+            self.object_list.filter(self._seek(values, 'lt'))
+        )
+        if not rows:
+            # Курсор устарел или подделан: за ним постов уже нет.
+            return self.page(self.num_pages)
+        return CursorPage(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page,
+            has_previous=True,
+        )
+
+    def page_before(self, token):
+        values, number = self.decode_cursor(token)
+        rows = self._fetch(
+            self.object_list.filter(
+                self._seek(values, 'gt')
+            ).order_by(*self.keys)
+        )
+        if not rows:
+            return self.page(1)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(
+            rows, number if has_previous else 1, self,
+            has_next=True,
+            has_previous=has_previous,
+        )
+
 
-def paginator(request, post_list, QTY=10):
-    paginator = Paginator(post_list, QTY)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def paginator(request, post_list, QTY=10, count_key=None,
+              keys=('pub_date', 'pk')):
+    paginator = CursorPaginator(
+        post_list, QTY, keys=keys, count_key=count_key
+    )
+    try:
+        if request.GET.get('after'):
+            return paginator.page_after(request.GET['after'])
+        if request.GET.get('before'):
+            return paginator.page_before(request.GET['before'])
+    except InvalidPage:
+        return paginator.page(1)
+    return paginator.get_page(request.GET.get('page'))
 
 
 def validate_not_empty(value):
@@ -1,38 +1,72 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.urls import reverse
+
+from core.replicas import read_from_replica
 
-from .models import Post, Group, User, Follow
+from . import writebehind
+from .caching import depends_on, feed_key
+from .counters import get_counters
+from .export import EXPORTS, FORMATS, lines, parse_since, rows
+from .models import Comment, Post, Group, User, Follow
+from .pagecache import cache_anonymous_page
+from .search import search_posts
+from .timelines import follow_feed
 from .utilits import paginator
 from .forms import PostForm, CommentForm
 
+COMMENTS_PER_PAGE = 20
+
 
+@cache_anonymous_page
+@read_from_replica
 def index(request):
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.all()
-    page_obj = paginator(request, post_list)
+    post_list = Post.objects.feed()
+    feed = feed_key('index')
+    page_obj = paginator(request, post_list, count_key=feed)
     context = {
         'title': title,
         'page_obj': page_obj,
+        'feed_key': feed,
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_anonymous_page
+@read_from_replica
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator(request, post_list)
+    post_list = group.posts.feed()
+    feed = feed_key(f'group:{group.pk}')
+    page_obj = paginator(request, post_list, count_key=feed)
     context = {
         'page_obj': page_obj,
         'group': group,
+        'feed_key': feed,
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous_page
+@read_from_replica
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    posts_count = author.posts.count()
-    page_obj = paginator(request, post_list)
+    post_list = author.posts.feed()
+    posts_count = get_counters(author.pk).posts_count
+    feed = feed_key(f'profile:{author.pk}')
+    page_obj = paginator(request, post_list, count_key=feed)
     following = request.user.is_authenticated and (
         request.user.follower.filter(author=author).exists()
     )
@@ -41,15 +75,33 @@ def profile(request, username):
         'posts_count': posts_count,
         'page_obj': page_obj,
         'following': following,
+        'feed_key': feed,
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(request, post_id):
+    return paginator(
+        request,
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        QTY=COMMENTS_PER_PAGE,
+        keys=('created', 'pk'),
+    )
+
+
+@cache_anonymous_page
+@read_from_replica
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.count()
-    comments = post.comments.all()
-    form = CommentForm()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    depends_on(f'post:{post.pk}', f'profile:{post.author_id}', *(
+        [f'group:{post.group_id}'] if post.group_id else []
+    ))
+    posts_count = get_counters(post.author_id).posts_count
+    comments = comments_page(request, post.pk)
+    form = CommentForm(initial={'idempotency_key': uuid.uuid4()})
     context = {
         'post': post,
         'posts_count': posts_count,
@@ -66,7 +118,10 @@ def post_create(request):
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    # Транзакция только вокруг записи: BEGIN IMMEDIATE блокирует других
+    # писателей, и рендер формы не должен её держать.
+    with transaction.atomic():
+        post.save()
     return redirect('posts:profile', username=post.author.username)
 
 
@@ -89,23 +144,78 @@ def post_edit(request, post_id,):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comments_page(request, post_id)
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=[comment.author.username]
+                ),
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in page
+        ],
+        'next': page.next_cursor or None,
+    })
+
+
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+    if not form.is_valid():
+        return redirect('posts:post_detail', post_id=post_id)
+    key = form.cleaned_data['idempotency_key'] or uuid.uuid4()
+    if writebehind.enabled():
+        writebehind.add_comment(
+            post.pk, request.user.pk, form.cleaned_data['text'], key
+        )
+        return redirect('posts:post_detail', post_id=post_id)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    comment.idempotency_key = key
+    try:
+        # Сохранение и сигналы одной транзакцией; повтор откатывает её
+        # целиком, без точки сохранения.
+        with transaction.atomic():
+            comment.save()
+    except IntegrityError:
+        # Та же форма отправлена повторно: комментарий уже есть.
+        pass
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_list = search_posts(Post.objects.feed(), query)
+    # Результаты поиска меняются вместе с лентой всех постов.
+    digest = hashlib.md5(query.encode()).hexdigest()
+    page_obj = paginator(
+        request, post_list, keys=('rank', 'pub_date', 'pk'),
+        count_key=f'{feed_key("index")}:search:{digest}',
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@read_from_replica
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = follow_feed(request.user)
+    feed = feed_key('index', f'follow:{request.user.pk}')
     context = {
-        'page_obj': paginator(request, post_list),
+        'page_obj': paginator(request, post_list, count_key=feed),
+        'feed_key': feed,
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -114,12 +224,43 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        if writebehind.enabled():
+            writebehind.follow(request.user.pk, author.pk)
+        else:
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    if writebehind.enabled():
+        writebehind.unfollow(request.user.pk, author.pk)
+    else:
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export(request):
+    kind = request.GET.get('model', 'posts')
+    format = request.GET.get('format', 'ndjson')
+    if kind not in EXPORTS or format not in FORMATS:
+        return HttpResponseBadRequest('Неизвестная модель или формат')
+    try:
+        since = after_id = None
+        if request.GET.get('since'):
+            since = parse_since(request.GET['since'])
+        if request.GET.get('after_id'):
+            after_id = int(request.GET['after_id'])
+    except ValueError:
+        return HttpResponseBadRequest('Некорректный водяной знак')
+    content_type = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        lines(kind, rows(kind, since, after_id), format),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{format}"'
+    )
+    return response
@@ -0,0 +1,243 @@
+"""Отложенная запись комментариев и подписок (write-behind).
+
+При WRITE_BEHIND_ENABLED представления только проверяют данные и кладут
+запись в надёжную очередь core.queue. Фоновый поток процесса раз в
+WRITE_BEHIND_FLUSH_INTERVAL секунд забирает очередь пачками и пишет
+в базу через bulk_create и массовое удаление, одной транзакцией на
+пачку. Задачи идемпотентны: комментарий с уже записанным ключом
+пропускается, а подписка задаёт итоговое состояние пары. Упавшая пачка
+повторяется по одной задаче: задача, которая падает раз за разом,
+уходит в таблицу dead очереди и не задерживает остальные.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.queue import MAX_ATTEMPTS, SQLiteQueue
+
+from . import counters, timelines
+from .caching import bump_feed_version, post_scopes
+from .models import Comment, Follow, Post, User
+
+logger = logging.getLogger(__name__)
+
+COMMENT, FOLLOW, UNFOLLOW = 'comment', 'follow', 'unfollow'
+
+_queue = None
+_worker = None
+_lock = threading.Lock()
+
+
+def enabled():
+    return settings.WRITE_BEHIND_ENABLED
+
+
+def get_queue():
+    global _queue
+    with _lock:
+        if _queue is None or _queue.path != settings.WRITE_BEHIND_QUEUE:
+            _queue = SQLiteQueue(settings.WRITE_BEHIND_QUEUE)
+        return _queue
+
+
+def _run_worker():
+    while True:
+        time.sleep(settings.WRITE_BEHIND_FLUSH_INTERVAL)
+        try:
+            while flush():
+                pass
+        except Exception:
+            logger.exception('Не удалось записать отложенные записи')
+        finally:
+            close_old_connections()
+
+
+def _start_worker():
+    global _worker
+    if not settings.WRITE_BEHIND_FLUSH_INTERVAL:
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run_worker, name='write-behind', daemon=True
+            )
+            _worker.start()
+
+
+def _put(kind, payload, key=None):
+    get_queue().put(kind, payload, key)
+    _start_worker()
+
+
+def add_comment(post_id, author_id, text, key):
+    _put(COMMENT, {
+        'post': post_id, 'author': author_id, 'text': text,
+        'key': str(key), 'created': timezone.now().isoformat(),
+    }, key=f'{COMMENT}:{key}')
+
+
+def follow(user_id, author_id):
+    _put(FOLLOW, {'user': user_id, 'author': author_id})
+
+
+def unfollow(user_id, author_id):
+    _put(UNFOLLOW, {'user': user_id, 'author': author_id})
+
+
+def _existing_users(ids):
+    return set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def _restore_dates(dates):
+    """Возвращает комментариям время отправки: один UPDATE на пачку.
+
+    Поле модели (keep_dates) из фонового потока не трогаем: оно общее
+    для всего процесса, и запрос в соседнем потоке сохранил бы NULL.
+    """
+    keys = list(dates)
+    for start in range(0, len(keys), settings.WRITE_BEHIND_BATCH_SIZE):
+        batch = keys[start:start + settings.WRITE_BEHIND_BATCH_SIZE]
+        Comment.objects.filter(idempotency_key__in=batch).update(
+            created=models.Case(
+                *(models.When(idempotency_key=key, then=models.Value(
+                    dates[key])) for key in batch),
+                output_field=models.DateTimeField(),
+            )
+        )
+
+
+def apply_comments(payloads):
+    by_key = {payload['key']: payload for payload in payloads}
+    existing = set(
+        str(key) for key in Comment.objects.filter(
+            idempotency_key__in=list(by_key)
+        ).values_list('idempotency_key', flat=True)
+    )
+    posts = {
+        row['pk']: row for row in Post.objects.filter(
+            pk__in={payload['post'] for payload in payloads}
+        ).values('pk', 'author_id', 'group_id')
+    }
+    authors = _existing_users({payload['author'] for payload in payloads})
+    comments = [
+        Comment(
+            post_id=payload['post'],
+            author_id=payload['author'],
+            text=payload['text'],
+            idempotency_key=key,
+            created=parse_datetime(payload['created']),
+        )
+        for key, payload in by_key.items()
+        # Пост или автора могли удалить, пока комментарий ждал
+        # в очереди.
+        if key not in existing and payload['post'] in posts
+        and payload['author'] in authors
+    ]
+    # auto_now_add при вставке заменяет время из очереди на текущее.
+    dates = {comment.idempotency_key: comment.created for comment in comments}
+    Comment.objects.bulk_create(comments, settings.WRITE_BEHIND_BATCH_SIZE)
+    _restore_dates(dates)
+    # bulk_create не шлёт сигналы: счётчики и ленты обновляем сами.
+    added = Counter(comment.post_id for comment in comments)
+    for post_id, count in added.items():
+        counters.change_comments_count(post_id, count)
+    bump_feed_version(*{
+        scope for post_id in added for scope in post_scopes(
+            posts[post_id]['author_id'], posts[post_id]['group_id'], post_id
+        )
+    })
+
+
+def apply_follows(jobs):
+    """Применяет подписки и отписки: побеждает последнее действие пары."""
+    final = {}
+    for kind, payload in jobs:
+        final[(payload['user'], payload['author'])] = kind
+    if not final:
+        return
+    users = _existing_users({user for pair in final for user in pair})
+    existing = {
+        (follow.user_id, follow.author_id): follow.pk
+        for follow in Follow.objects.filter(
+            user_id__in=users, author_id__in=users
+        ).only('user_id', 'author_id')
+    }
+    created = [
+        (user, author) for (user, author), kind in final.items()
+        if kind == FOLLOW and (user, author) not in existing
+        and user != author and {user, author} <= users
+    ]
+    Follow.objects.bulk_create(
+        [Follow(user_id=user, author_id=author) for user, author in created],
+        settings.WRITE_BEHIND_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    for field, counted in (
+        ('followers_count', Counter(author for user, author in created)),
+        ('following_count', Counter(user for user, author in created)),
+    ):
+        for user_id, delta in counted.items():
+            counters.change_user_counter(user_id, field, delta)
+    if timelines.timelines_enabled():
+        for user, author in created:
+            timelines.backfill(user, author)
+    bump_feed_version(*(f'follow:{user}' for user, author in created))
+    # Удаление через QuerySet само шлёт сигналы: счётчики, ленты
+    # и лента подписок обновятся так же, как при обычной отписке.
+    Follow.objects.filter(pk__in=[
+        existing[pair] for pair, kind in final.items()
+        if kind == UNFOLLOW and pair in existing
+    ]).delete()
+
+
+def _apply(jobs):
+    with transaction.atomic():
+        apply_comments([
+            payload for pk, kind, payload in jobs if kind == COMMENT
+        ])
+        apply_follows([
+            (kind, payload) for pk, kind, payload in jobs
+            if kind in (FOLLOW, UNFOLLOW)
+        ])
+
+
+def _apply_one_by_one(queue, jobs):
+    """Повторяет упавшую пачку по одной задаче, чтобы найти плохую.
+
+    Задачи до плохой записываются, плохая получает ещё одну попытку,
+    а следующие за ней возвращаются в очередь: порядок важен.
+    """
+    for index, (pk, kind, payload) in enumerate(jobs):
+        try:
+            _apply([(pk, kind, payload)])
+        except Exception as error:
+            queue.release([job[0] for job in jobs[index + 1:]])
+            if not queue.fail(pk, repr(error)):
+                raise
+            logger.exception(
+                'Задача %s (%s) отложена в dead после %s попыток',
+                pk, kind, MAX_ATTEMPTS,
+            )
+            return index + 1
+        queue.ack([pk])
+    return len(jobs)
+
+
+def flush(limit=None):
+    """Записывает одну пачку из очереди; возвращает число задач."""
+    queue = get_queue()
+    jobs = queue.claim(limit or settings.WRITE_BEHIND_BATCH_SIZE)
+    if not jobs:
+        return 0
+    try:
+        _apply(jobs)
+    except Exception:
+        return _apply_one_by_one(queue, jobs)
+    queue.ack([pk for pk, kind, payload in jobs])
+    return len(jobs)
@@ -0,0 +1,40 @@
+// Кнопка «Показать ещё» догружает комментарии без перезагрузки страницы.
+(function () {
+  var more = document.getElementById('comments-more');
+  var list = document.getElementById('comments');
+  if (!more || !list || !window.fetch) {
+    return;
+  }
+  more.addEventListener('click', function (event) {
+    event.preventDefault();
+    var url = more.dataset.url + '?after=' + encodeURIComponent(more.dataset.cursor);
+    fetch(url).then(function (response) {
+      return response.json();
+    }).then(function (page) {
+      page.comments.forEach(function (comment) {
+        var item = document.createElement('div');
+        item.className = 'media mb-4';
+        var body = document.createElement('div');
+        body.className = 'media-body';
+        var title = document.createElement('h5');
+        title.className = 'mt-0';
+        var author = document.createElement('a');
+        author.href = comment.author_url;
+        author.textContent = comment.author;
+        var text = document.createElement('p');
+        text.textContent = comment.text;
+        title.appendChild(author);
+        body.appendChild(title);
+        body.appendChild(text);
+        item.appendChild(body);
+        list.appendChild(item);
+      });
+      if (page.next) {
+        more.dataset.cursor = page.next;
+        more.href = '?after=' + encodeURIComponent(page.next);
+      } else {
+        more.remove();
+      }
+    });
+  });
+}());
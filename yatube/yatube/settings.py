@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from pathlib import Path
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,12 +65,22 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Хранить скомпилированные шаблоны в памяти процесса и компилировать
+# их все при старте: процесс с битым шаблоном не запустится.
+TEMPLATE_CACHE = not DEBUG
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': (
+                [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+                if TEMPLATE_CACHE else TEMPLATE_LOADERS
+            ),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -79,6 +92,11 @@ TEMPLATES = [
     },
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+    INTERNAL_IPS = ['127.0.0.1']
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -87,11 +105,46 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с BEGIN IMMEDIATE для записи (core.db.sqlite3).
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Соединение живёт между запросами: не открываем файл
+        # и не применяем SQLITE_PRAGMAS на каждый запрос.
+        'CONN_MAX_AGE': 60,
+    },
+    # Реплика только для чтения. Локально это копия основной базы,
+    # которую обновляет manage.py sync_replica.
+    'replica': {
+        'ENGINE': 'core.db.sqlite3',
+        'NAME': Path(BASE_DIR, 'db_replica.sqlite3').as_uri() + '?mode=ro',
+        # Без CONN_MAX_AGE: sync_replica подменяет файл, и долгоживущее
+        # соединение читало бы старую копию.
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Применяются к каждому новому соединению с SQLite (core.signals).
+# WAL пускает читателей параллельно с писателем, а synchronous=NORMAL
+# в режиме WAL не теряет целостность, только последние транзакции при
+# отключении питания.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
 }
 
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Реплики, с которых читают ленты и страницы постов. Пока список пуст,
+# всё читается с основной базы.
+DATABASE_REPLICAS = []
+# Сколько секунд после записи клиент читает с основной базы.
+REPLICA_PIN_SECONDS = 10
+# На сколько секунд выключается недоступная реплика.
+REPLICA_RETRY_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -148,6 +201,78 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.instrumented.LocMemCache',
+    },
+    # Общий для всех процессов кэш: версии и фрагменты лент, счётчики
+    # пагинатора, метаданные миниатюр. Если рядом есть Redis или memcached,
+    # достаточно перенаправить этот алиас на них.
+    'shared': {
+        'BACKEND': 'core.cache.instrumented.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'shared.sqlite3'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Время жизни кэша лент: страницы инвалидируются сигналами,
+# поэтому TTL можно держать большим.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Целые страницы лент и постов для анонимных читателей (posts.pagecache).
+# При разработке страницы рендерятся заново, как и шаблоны.
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_TIMEOUT = FEED_CACHE_TIMEOUT
+# Готовые карточки постов (posts.cards). Карточка под ключом с версией
+# поста не меняется, поэтому хватает кэша в памяти процесса.
+POST_CARD_CACHE = 'default'
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Ленты подписок, собранные при записи (fan-out-on-write).
+FOLLOW_TIMELINE_ENABLED = False
+# Сколько последних постов хранится в ленте одного пользователя.
+FOLLOW_TIMELINE_SIZE = 500
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении.
+FOLLOW_TIMELINE_FANOUT_LIMIT = 1000
+
+# Миниатюры картинок постов создаются в фоновом пуле потоков.
+THUMBNAIL_PREGENERATE_ASYNC = True
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_CACHE = 'shared'
+
+# Стоимость запросов (core.perf): гистограммы каждого процесса раз
+# в PERF_FLUSH_INTERVAL секунд сохраняются в общий кэш PERF_CACHE.
+# Заголовок Server-Timing выдаёт устройство сервера, поэтому в бою
+# он отправляется только сотрудникам.
+PERF_CACHE = 'shared'
+PERF_FLUSH_INTERVAL = 10
+PERF_SERVER_TIMING = DEBUG
+
+# Бюджеты SQL-запросов по именам представлений. Превышение пишется
+# в лог, а в тестах (QueryBudgetRunner) роняет тест.
+# Для страниц с сессией пользователя учтены запросы сессии и профиля.
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 5,
+    'posts:profile': 6,
+    'posts:follow_index': 7,
+    'posts:post_detail': 5,
+    'posts:post_comments': 3,
+    'posts:search': 5,
+    'posts:api_index': 3,
+    'posts:api_group_list': 3,
+    'posts:api_profile': 3,
+    'posts:api_follow_index': 4,
+    'posts:api_post_detail': 3,
 }
+QUERY_BUDGET_STRICT = False
+TEST_RUNNER = 'core.runner.QueryBudgetRunner'
+
+# Отложенная запись комментариев и подписок (posts.writebehind): запросы
+# кладут записи в очередь в SQLite-файле, фоновый поток каждого процесса
+# пишет их в базу пачками. Без интервала очередь разбирает только
+# manage.py flush_write_behind.
+WRITE_BEHIND_ENABLED = False
+WRITE_BEHIND_QUEUE = os.path.join(BASE_DIR, 'cache', 'write_behind.sqlite3')
+WRITE_BEHIND_BATCH_SIZE = 500
+WRITE_BEHIND_FLUSH_INTERVAL = 1.0